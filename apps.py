@@ -2,14 +2,28 @@ import streamlit as st
 
 import pandas as pd
 import os
+import re
 import hashlib
 import uuid
 import base64
+import json
+import unicodedata
+import zipfile
 from datetime import datetime
 from io import BytesIO
 import time
 from storage import FileStorage
-from database import db, adapt_query
+from database import db, adapt_query, insert_returning_id
+from cache import app_cache
+from reference_data import get_reference_data, invalidate_reference_data
+from bulk_import import (
+    get_import_runner, validate_import, open_archive, list_jobs as list_import_jobs, job_progress,
+    JOB_EN_ATTENTE, JOB_EN_COURS, JOB_TERMINE, JOB_ECHEC, JOB_INTERROMPU, LIGNE_COPIEE
+)
+from pdf_extraction import (
+    get_pipeline, set_status, write_pages, EN_ATTENTE, EN_COURS, TERMINE, ERREUR,
+    get_status as get_extraction_status, status_counts as extraction_status_counts
+)
 
 # Configuration du thème global
 st.markdown("""
@@ -206,6 +220,7 @@ def add_entity(nom):
         db.connect()
         db.cursor.execute(adapt_query("INSERT INTO entites (nom) VALUES (%s)", db.config['db_type']), (nom_clean,))
         db.conn.commit()
+        invalidate_reference_data()
         result = (True, f"Entité '{nom_clean}' ajoutée avec succès.")
     except Exception as e:
         # Gestion d'erreur détaillée pour duplication ou autre problème
@@ -213,6 +228,8 @@ def add_entity(nom):
             result = (False, f"L'entité '{nom_clean}' existe déjà dans la base de données.")
         elif 'duplicate key value violates unique constraint' in str(e):  # PostgreSQL
             result = (False, f"L'entité '{nom_clean}' existe déjà dans la base de données.")
+        elif 'UNIQUE constraint failed' in str(e):  # SQLite
+            result = (False, f"L'entité '{nom_clean}' existe déjà dans la base de données.")
         else:
             result = (False, f"Erreur lors de l'ajout de l'entité : {str(e)}")
     finally:
@@ -221,10 +238,7 @@ def add_entity(nom):
 
 # Fonction pour récupérer toutes les entités
 def get_all_entities():
-    db.connect()
-    df = pd.read_sql_query(adapt_query("SELECT * FROM entites ORDER BY nom", db.config['db_type']), db.conn)
-    db.close()
-    return df
+    return get_reference_data().entites.copy()
 
 # Fonction pour supprimer une entité
 def delete_entity(entity_id):
@@ -236,6 +250,7 @@ def delete_entity(entity_id):
             return False, "Cette entité est associée à des filières et ne peut pas être supprimée."
         db.cursor.execute(adapt_query("DELETE FROM entites WHERE id=%s", db.config['db_type']), (entity_id,))
         db.conn.commit()
+        invalidate_reference_data()
         return True, "Entité supprimée avec succès."
     finally:
         db.close()
@@ -246,6 +261,7 @@ def add_filiere(nom, entite_id):
         db.connect()
         db.cursor.execute(adapt_query("INSERT INTO filieres (nom, entite_id) VALUES (%s, %s)", db.config['db_type']), (nom, entite_id))
         db.conn.commit()
+        invalidate_reference_data()
         result = True, "Filière ajoutée avec succès."
     except Exception:
         result = False, "Cette filière existe déjà pour cette entité."
@@ -255,16 +271,7 @@ def add_filiere(nom, entite_id):
 
 # Fonction pour récupérer toutes les filières
 def get_all_filieres():
-    db.connect()
-    query = """
-    SELECT f.id, f.nom, e.nom as entite_nom, f.entite_id 
-    FROM filieres f 
-    JOIN entites e ON f.entite_id = e.id 
-    ORDER BY e.nom, f.nom
-    """
-    df = pd.read_sql_query(adapt_query(query, db.config['db_type']), db.conn)
-    db.close()
-    return df
+    return get_reference_data().filieres.copy()
 
 # Fonction pour supprimer une filière
 def delete_filiere(filiere_id):
@@ -276,6 +283,7 @@ def delete_filiere(filiere_id):
             return False, "Cette filière est associée à des mémoires et ne peut pas être supprimée."
         db.cursor.execute(adapt_query("DELETE FROM filieres WHERE id=%s", db.config['db_type']), (filiere_id,))
         db.conn.commit()
+        invalidate_reference_data()
         return True, "Filière supprimée avec succès."
     finally:
         db.close()
@@ -286,6 +294,7 @@ def add_session(annee):
     try:
         db.cursor.execute(adapt_query("INSERT INTO sessions (annee_universitaire) VALUES (%s)", db.config['db_type']), (annee,))
         db.conn.commit()
+        invalidate_reference_data()
         result = True, "Session ajoutée avec succès."
     except Exception as e:
         result = False, f"Erreur lors de l'ajout de la session : {str(e)}"
@@ -295,10 +304,7 @@ def add_session(annee):
 
 # Fonction pour récupérer toutes les sessions
 def get_all_sessions():
-    db.connect()
-    df = pd.read_sql_query(adapt_query("SELECT * FROM sessions ORDER BY annee_universitaire DESC", db.config['db_type']), db.conn)
-    db.close()
-    return df
+    return get_reference_data().sessions.copy()
 
 # Fonction pour supprimer une session
 def delete_session(session_id):
@@ -310,6 +316,7 @@ def delete_session(session_id):
             return False, "Cette session est associée à des mémoires et ne peut pas être supprimée."
         db.cursor.execute(adapt_query("DELETE FROM sessions WHERE id=%s", db.config['db_type']), (session_id,))
         db.conn.commit()
+        invalidate_reference_data()
         return True, "Session supprimée avec succès."
     finally:
         db.close()
@@ -324,25 +331,47 @@ def save_pdf(uploaded_file, filename):
 # Fonction pour sauvegarder le contenu d'un PDF dans la base de données
 def save_pdf_content(memoire_id, pdf_content):
     """Sauvegarde le contenu du PDF dans la base de données."""
-    db.connect()
     try:
-        # Supprimer l'ancien contenu s'il existe
-        db.cursor.execute(adapt_query("DELETE FROM pdf_content WHERE memoire_id = %s", db.config['db_type']), (memoire_id,))
-        
-        # Insérer le nouveau contenu
-        for page in pdf_content:
-            db.cursor.execute(adapt_query("""
-            INSERT INTO pdf_content (memoire_id, page_num, content)
-            VALUES (%s, %s, %s)
-            """, db.config['db_type']), (memoire_id, page['page_num'], page['text']))
-        
-        db.conn.commit()
+        write_pages(memoire_id, ((page['page_num'], page['text']) for page in pdf_content))
         return True
     except Exception as e:
         st.error(f"Erreur lors de la sauvegarde du contenu: {str(e)}")
         return False
-    finally:
-        db.close()
+
+EXTRACTION_LABELS = {
+    EN_ATTENTE: "⏳ en attente d'extraction",
+    EN_COURS: "⚙️ extraction en cours",
+    TERMINE: "✅ indexé",
+    ERREUR: "⚠️ échec de l'extraction",
+}
+
+IMPORT_JOB_LABELS = {
+    JOB_EN_ATTENTE: "⏳ En file d'attente",
+    JOB_EN_COURS: "⚙️ En cours",
+    JOB_TERMINE: "✅ Terminé",
+    JOB_ECHEC: "❌ Échec",
+    JOB_INTERROMPU: "⏸️ Interrompu",
+}
+
+IMPORT_TYPE_LABELS = {
+    'memoires': "Import de mémoires",
+    'complet': "Import complet",
+}
+
+# Provenance des fichiers d'un import en masse
+IMPORT_SOURCE_ZIP = "Archive ZIP téléversée"
+IMPORT_SOURCE_FOLDER = "Dossier sur le serveur"
+
+# Délai entre deux actualisations du suivi des imports (secondes)
+IMPORT_REFRESH_SECONDS = 3
+# Actualisations du panneau avant de réexécuter la page (et de rendre la main)
+IMPORT_REFRESH_ROUNDS = 20
+
+# Fonction pour programmer l'extraction du texte des PDF
+def schedule_extraction(memoires):
+    """Confie au pool d'extraction des mémoires (id, fichier_url) marqués en attente."""
+    if memoires:
+        get_pipeline(storage.get_file).submit(memoires)
 
 # Fonction pour ajouter un mémoire
 def add_memoire(titre, auteurs, encadreur, resume, fichier_url, tags, filiere_id, session_id, version):
@@ -351,13 +380,17 @@ def add_memoire(titre, auteurs, encadreur, resume, fichier_url, tags, filiere_id
         date_now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         # Insérer le mémoire
-        db.cursor.execute(adapt_query("""
+        memoire_id = insert_returning_id(db.cursor, """
         INSERT INTO memoires 
         (titre, auteurs, encadreur, resume, fichier_url, tags, filiere_id, session_id, version, date_ajout) 
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, db.config['db_type']), (titre, auteurs, encadreur, resume, fichier_url, tags, filiere_id, session_id, version, date_now))
+        """, (titre, auteurs, encadreur, resume, fichier_url, tags, filiere_id, session_id, version, date_now), db.config['db_type'])
+        # Le texte du PDF sera extrait en arrière-plan
+        set_status(db.cursor, db.config['db_type'], [memoire_id], EN_ATTENTE)
         
         db.conn.commit()
+        app_cache.invalidate('memoires')
+        schedule_extraction([(memoire_id, fichier_url)])
         result = True, "Mémoire ajouté avec succès."
     except Exception as e:
         db.conn.rollback()
@@ -388,6 +421,83 @@ def get_all_memoires():
     finally:
         db.close()
 
+# Fonction pour récupérer les derniers mémoires ajoutés
+def get_latest_memoires(n=5):
+    """Retourne les `n` derniers mémoires ajoutés (pages d'accueil).
+
+    Le résultat est mis en cache pour tout le processus et invalidé à chaque
+    ajout, modification ou suppression de mémoire.
+    """
+    def load():
+        query = """
+        SELECT m.id, m.titre, m.auteurs, m.encadreur, m.resume, m.fichier_url, m.tags,
+               f.nom as filiere_nom, s.annee_universitaire, e.nom as entite_nom
+        FROM memoires m
+        JOIN filieres f ON m.filiere_id = f.id
+        JOIN sessions s ON m.session_id = s.id
+        JOIN entites e ON f.entite_id = e.id
+        ORDER BY m.date_ajout DESC, m.id DESC
+        LIMIT %s
+        """
+        db.connect()
+        try:
+            return pd.read_sql_query(adapt_query(query, db.config['db_type']), db.conn, params=(n,))
+        finally:
+            db.close()
+    
+    # Copie : les appelants ne doivent pas modifier la valeur partagée
+    return app_cache.get_or_load(('latest_memoires', n), load, tags=('memoires',)).copy()
+
+# Délai pendant lequel un fichier tout juste enregistré ou réutilisé n'est pas supprimé
+RECENT_FILE_SECONDS = 60
+
+# Fonction pour supprimer du disque les fichiers qui ne sont plus référencés
+def purge_released_files():
+    """Supprime les fichiers dont le compteur de `fichiers` est tombé à zéro.
+
+    Les compteurs sont tenus à jour par trigger sur `memoires`. Un fichier
+    modifié depuis moins de RECENT_FILE_SECONDS est conservé (il vient
+    peut-être d'être réutilisé par un enregistrement en cours) et reste
+    inscrit avec zéro référence : il sera supprimé lors d'un prochain passage.
+    Retourne le nombre de fichiers retirés du registre.
+    """
+    db.connect()
+    try:
+        # Les PDFs copiés par un import en cours, pas encore insérés, comptent
+        # comme des références
+        db.cursor.execute(adapt_query("""
+        SELECT fichier_url FROM fichiers
+        WHERE nb_references <= 0
+          AND fichier_url NOT IN (
+              SELECT fichier_url FROM import_manifest WHERE statut = %s AND fichier_url IS NOT NULL
+          )
+        """, db.config['db_type']), (LIGNE_COPIEE,))
+        removed = []
+        for (fichier_url,) in [tuple(row) for row in db.cursor.fetchall()]:
+            if fichier_url.startswith("local://"):
+                try:
+                    deleted = storage.delete_file(fichier_url, min_age=RECENT_FILE_SECONDS)
+                    if not deleted and storage.get_download_url(fichier_url) is not None:
+                        continue
+                except Exception as e:
+                    print(f"Avertissement: Erreur lors de la suppression du fichier: {e}")
+                    continue
+            removed.append((fichier_url,))
+        # Un fichier de nouveau référencé entre-temps reste inscrit
+        db.cursor.executemany(
+            adapt_query("DELETE FROM fichiers WHERE fichier_url = %s AND nb_references <= 0", db.config['db_type']),
+            removed
+        )
+        db.conn.commit()
+        return len(removed)
+    except Exception as e:
+        # Simple nettoyage : les fichiers restent inscrits pour un prochain passage
+        db.conn.rollback()
+        print(f"Avertissement: Erreur lors du nettoyage des fichiers: {e}")
+        return 0
+    finally:
+        db.close()
+
 # Fonction pour supprimer un mémoire
 def delete_memoire(memoire_id):
     db.connect()
@@ -399,23 +509,17 @@ def delete_memoire(memoire_id):
         if result is None:
             return False, f"Mémoire avec ID {memoire_id} non trouvé dans la base de données."
         
-        file_path = result[1]
-        
         # Supprimer d'abord les références dans la table favoris
         db.cursor.execute(adapt_query("DELETE FROM favoris WHERE memoire_id = %s", db.config['db_type']), (memoire_id,))
         
         # Supprimer le mémoire de la base de données
         db.cursor.execute(adapt_query("DELETE FROM memoires WHERE id = %s", db.config['db_type']), (memoire_id,))
         
-        # Supprimer le fichier PDF si nécessaire
-        if file_path and file_path.startswith("local://"):
-            try:
-                storage.delete_file(file_path)
-            except Exception as e:
-                print(f"Avertissement: Erreur lors de la suppression du fichier: {e}")
-                # On continue même si la suppression du fichier échoue
-        
         db.conn.commit()
+        app_cache.invalidate('memoires')
+        
+        # Supprimer le fichier PDF s'il n'est plus partagé avec un autre mémoire
+        purge_released_files()
         return True, "Mémoire supprimé avec succès."
         
     except Exception as e:
@@ -424,20 +528,68 @@ def delete_memoire(memoire_id):
     finally:
         db.close()
 
-# Fonction pour rechercher des mémoires
-def search_memoires(query, entity=None, filiere=None, session=None):
-    db.connect()
+# Pondération bm25 des colonnes de memoires_fts (titre > mots-clés > résumé)
+FTS_WEIGHTS = "10.0, 5.0, 2.0, 1.0, 1.0"
+
+# Fonction pour convertir une saisie libre en requête plein texte
+def build_fulltext_query(query, db_type):
+    """Traduit la saisie de l'utilisateur en requête plein texte préfixée.
+
+    Chaque mot doit apparaître (ET logique) et peut n'être qu'un début de mot.
+    Retourne None si la saisie ne contient aucun mot.
+    """
+    terms = re.findall(r"\w+", query.lower())
+    if not terms:
+        return None
+    if db_type == 'sqlite':
+        return " ".join(f'"{term}"*' for term in terms)
+    return " & ".join(f"{term}:*" for term in terms)
+
+# Colonnes renvoyées par les recherches de mémoires
+SEARCH_COLUMNS = """
+    m.id, m.titre, m.auteurs, m.encadreur, {resume} as resume, m.fichier_url, m.tags,
+    f.nom as filiere_nom, s.annee_universitaire, m.version, m.date_ajout,
+    e.nom as entite_nom
+"""
+
+# Fonction pour construire la partie FROM/WHERE d'une recherche
+def _search_clauses(query, entity, filiere, session, db_type):
+    """Retourne (from_where, params, score_expr) d'une recherche de mémoires.
+
+    `score_expr` vaut None lorsqu'aucun terme plein texte n'est recherché.
+    """
+    fts_query = build_fulltext_query(query, db_type) if query else None
     conditions = []
     params = []
+    score_expr = None
     
-    # Construire la condition de recherche texte
-    if query:
-        text_search = """
-        (m.titre LIKE %s OR m.auteurs LIKE %s OR m.encadreur LIKE %s OR m.resume LIKE %s OR m.tags LIKE %s)
-        """
-        for _ in range(5):
-            params.append(f"%{query}%")
-        conditions.append(text_search)
+    if fts_query and db_type == 'sqlite':
+        score_expr = f"-bm25(memoires_fts, {FTS_WEIGHTS})"
+        sql = """
+    FROM memoires_fts
+    JOIN memoires m ON m.id = memoires_fts.rowid
+    """
+        conditions.append("memoires_fts MATCH %s")
+        params.append(fts_query)
+    elif fts_query:
+        # ts_rank_cd renvoie un real : converti une fois pour toutes en float8
+        # afin que le curseur de pagination (float Python) le compare exactement
+        score_expr = "ts_rank_cd(m.search_vector, q)::float8"
+        sql = """
+    FROM memoires m
+    CROSS JOIN to_tsquery('french', %s) q
+    """
+        conditions.append("m.search_vector @@ q")
+        params.append(fts_query)
+    else:
+        sql = """
+    FROM memoires m
+    """
+    sql += """
+    JOIN filieres f ON m.filiere_id = f.id
+    JOIN sessions s ON m.session_id = s.id
+    JOIN entites e ON f.entite_id = e.id
+    """
     
     # Ajouter les filtres supplémentaires
     if entity:
@@ -452,33 +604,154 @@ def search_memoires(query, entity=None, filiere=None, session=None):
         conditions.append("s.id = %s")
         params.append(session)
     
-    # Construire la requête SQL
-    sql = """
-    SELECT m.id, m.titre, m.auteurs, m.encadreur, m.resume, m.fichier_url, m.tags, 
-           f.nom as filiere_nom, s.annee_universitaire, m.version, m.date_ajout,
-           e.nom as entite_nom
-    FROM memoires m
-    JOIN filieres f ON m.filiere_id = f.id
-    JOIN sessions s ON m.session_id = s.id
-    JOIN entites e ON f.entite_id = e.id
-    """
-    
     if conditions:
         sql += " WHERE " + " AND ".join(conditions)
+    return sql, params, score_expr
+
+# Fonction pour rechercher des mémoires
+def search_memoires(query, entity=None, filiere=None, session=None):
+    """Recherche plein texte classée par pertinence, avec filtres optionnels."""
+    db_type = db.config['db_type']
+    from_where, params, score_expr = _search_clauses(query, entity, filiere, session, db_type)
+    sql = "SELECT " + SEARCH_COLUMNS.format(resume="m.resume")
+    if score_expr:
+        sql += f", {score_expr} as score"
+    sql += from_where
     
-    sql += " ORDER BY m.date_ajout DESC"
+    # Les plus pertinents d'abord, puis les plus récents
+    sql += " ORDER BY score DESC, m.date_ajout DESC" if score_expr else " ORDER BY m.date_ajout DESC"
     
-    df = pd.read_sql_query(adapt_query(sql, db.config['db_type']), db.conn, params=params)
-    db.close()
-    return df
+    db.connect()
+    try:
+        return pd.read_sql_query(adapt_query(sql, db_type), db.conn, params=params)
+    finally:
+        db.close()
+
+# Nombre de résultats affichés par page de recherche
+SEARCH_PAGE_SIZE = 10
+
+# Fonction pour rechercher une page de mémoires
+def search_memoires_page(query, entity=None, filiere=None, session=None,
+                         page=1, page_size=10, after=None, with_total=True):
+    """Retourne une seule page de résultats de recherche.
+
+    La page est désignée soit par son numéro (`page`, pour les premières
+    pages), soit par le curseur `after` renvoyé par la page précédente
+    (pagination par clé, sans OFFSET, pour les pages profondes). Le résumé
+    est tronqué côté base. Retourne un dictionnaire contenant `results`
+    (DataFrame), `total` (None si `with_total` est faux) et `next_cursor`
+    (None s'il n'y a pas de page suivante).
+    """
+    db_type = db.config['db_type']
+    from_where, params, score_expr = _search_clauses(query, entity, filiere, session, db_type)
+    
+    sql = "SELECT " + SEARCH_COLUMNS.format(resume="substr(m.resume, 1, 201)")
+    if score_expr:
+        sql += f", {score_expr} as score"
+    sql += from_where
+    page_params = list(params)
+    
+    # Pagination par clé : reprendre juste après la dernière ligne affichée
+    if after is not None:
+        keyset = "(m.date_ajout, m.id) < (%s, %s)"
+        if score_expr:
+            keyset = f"({score_expr} < %s OR ({score_expr} = %s AND {keyset}))"
+            page_params += [after['score'], after['score']]
+        page_params += [after['date_ajout'], after['id']]
+        sql += (" AND " if " WHERE " in from_where else " WHERE ") + keyset
+    
+    order = "m.date_ajout DESC, m.id DESC"
+    sql += f" ORDER BY {'score DESC, ' if score_expr else ''}{order}"
+    # Une ligne de plus pour savoir s'il existe une page suivante
+    sql += " LIMIT %s"
+    page_params.append(page_size + 1)
+    if after is None and page > 1:
+        sql += " OFFSET %s"
+        page_params.append((page - 1) * page_size)
+    
+    db.connect()
+    try:
+        df = pd.read_sql_query(adapt_query(sql, db_type), db.conn, params=page_params)
+        total = None
+        if with_total:
+            db.cursor.execute(adapt_query("SELECT COUNT(*)" + from_where, db_type), params)
+            total = db.cursor.fetchone()[0]
+    finally:
+        db.close()
+    
+    next_cursor = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        next_cursor = _row_cursor(df.iloc[-1], with_score=score_expr is not None)
+    return {'results': df, 'total': total, 'next_cursor': next_cursor}
+
+# Fonction pour extraire la clé de pagination d'une ligne de résultat
+def _row_cursor(row, with_score=False):
+    """Convertit une ligne en curseur (types Python natifs, utilisables en paramètres)."""
+    date_ajout = row['date_ajout']
+    return {
+        'date_ajout': date_ajout.to_pydatetime() if hasattr(date_ajout, 'to_pydatetime') else date_ajout,
+        'id': int(row['id']),
+        'score': float(row['score']) if with_score else None,
+    }
+
+# Fonction pour lister les mémoires page par page (administration)
+def list_memoires_page(search=None, page_size=10, after=None, before=None, with_total=True):
+    """Retourne une page de mémoires triés par date d'ajout décroissante.
+
+    Pagination par clé (date_ajout, id) dans les deux sens : `after` donne la
+    page suivant un curseur, `before` la page qui le précède. Le filtre texte
+    est appliqué par l'index plein texte. Chaque appel lit au plus
+    `page_size + 1` lignes ; le total n'est compté que si `with_total`.
+    """
+    db_type = db.config['db_type']
+    from_where, params, _ = _search_clauses(search, None, None, None, db_type)
+    sql = "SELECT " + SEARCH_COLUMNS.format(resume="substr(m.resume, 1, 201)") + from_where
+    page_params = list(params)
+    
+    keyset = None
+    if after is not None:
+        keyset, cursor = "(m.date_ajout, m.id) < (%s, %s)", after
+    elif before is not None:
+        keyset, cursor = "(m.date_ajout, m.id) > (%s, %s)", before
+    if keyset:
+        sql += (" AND " if " WHERE " in from_where else " WHERE ") + keyset
+        page_params += [cursor['date_ajout'], cursor['id']]
+    
+    # En reculant, on lit dans l'ordre croissant puis on réinverse
+    direction = "ASC" if before is not None else "DESC"
+    sql += f" ORDER BY m.date_ajout {direction}, m.id {direction} LIMIT %s"
+    page_params.append(page_size + 1)
+    
+    db.connect()
+    try:
+        df = pd.read_sql_query(adapt_query(sql, db_type), db.conn, params=page_params)
+        total = None
+        if with_total:
+            db.cursor.execute(adapt_query("SELECT COUNT(*)" + from_where, db_type), params)
+            total = db.cursor.fetchone()[0]
+    finally:
+        db.close()
+    
+    has_more = len(df) > page_size
+    df = df.iloc[:page_size]
+    if before is not None:
+        df = df.iloc[::-1].reset_index(drop=True)
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, after is not None
+    return {
+        'results': df,
+        'total': total,
+        'first_cursor': _row_cursor(df.iloc[0]) if len(df) else None,
+        'last_cursor': _row_cursor(df.iloc[-1]) if len(df) else None,
+        'has_next': has_next,
+        'has_previous': has_previous,
+    }
 
 # Fonction pour obtenir les filieres d'une entité
 def get_filieres_by_entity(entity_id):
-    db.connect()
-    query = adapt_query("SELECT id, nom FROM filieres WHERE entite_id=%s ORDER BY nom", db.config['db_type'])
-    df = pd.read_sql_query(query, db.conn, params=(entity_id,))
-    db.close()
-    return df
+    return get_reference_data().filieres_of(entity_id).copy()
 
 # Fonction pour obtenir le détail d'un mémoire
 def get_memoire_details(memoire_id):
@@ -510,6 +783,7 @@ def update_memoire(memoire_id, titre, auteurs, encadreur, resume, fichier_url, t
             WHERE id=%s
             """
             db.cursor.execute(adapt_query(query, db.config['db_type']), (titre, auteurs, encadreur, resume, fichier_url, tags, filiere_id, session_id, version, memoire_id))
+            set_status(db.cursor, db.config['db_type'], [memoire_id], EN_ATTENTE)
         else:  # Pas de nouveau fichier PDF
             query = """
             UPDATE memoires 
@@ -518,6 +792,11 @@ def update_memoire(memoire_id, titre, auteurs, encadreur, resume, fichier_url, t
             """
             db.cursor.execute(adapt_query(query, db.config['db_type']), (titre, auteurs, encadreur, resume, tags, filiere_id, session_id, version, memoire_id))
         db.conn.commit()
+        app_cache.invalidate('memoires')
+        if fichier_url:
+            # L'ancien fichier n'est plus référencé s'il n'était pas partagé
+            purge_released_files()
+            schedule_extraction([(memoire_id, fichier_url)])
         result = True, "Mémoire mis à jour avec succès."
     except Exception as e:
         db.conn.rollback()
@@ -526,46 +805,74 @@ def update_memoire(memoire_id, titre, auteurs, encadreur, resume, fichier_url, t
         db.close()
     return result
 
+# Fonction pour obtenir le cube des statistiques
+def get_statistics_cube():
+    """Retourne le nombre de mémoires par entité, filière et année universitaire.
+
+    Une seule requête sur les compteurs de `stats_memoires` ; le résultat est
+    mis en cache et invalidé à chaque écriture sur les mémoires ou les données
+    de référence. Tous les graphiques et tableaux croisés en sont extraits.
+    """
+    def load():
+        query = """
+        SELECT e.id as entite_id, e.nom as entite, f.id as filiere_id, f.nom as filiere,
+               s.id as session_id, s.annee_universitaire as annee, sm.nb as count
+        FROM stats_memoires sm
+        JOIN filieres f ON sm.filiere_id = f.id
+        JOIN entites e ON f.entite_id = e.id
+        JOIN sessions s ON sm.session_id = s.id
+        WHERE sm.nb > 0
+        """
+        db.connect()
+        try:
+            cube = pd.read_sql_query(adapt_query(query, db.config['db_type']), db.conn)
+        finally:
+            db.close()
+        cube['count'] = cube['count'].astype('int64')
+        return cube
+    
+    return app_cache.get_or_load('statistics_cube', load, tags=('memoires', 'reference')).copy()
+
+def _count_by(cube, column, name=None):
+    counts = cube.groupby(column, as_index=False, sort=False)['count'].sum()
+    return counts.rename(columns={column: name or column})
+
 # Fonction pour obtenir les statistiques
-def get_statistics():
-    db.connect()
+def get_statistics(cube=None):
+    """Agrégats de la page Statistiques, calculés à partir du cube."""
+    if cube is None:
+        cube = get_statistics_cube()
     stats = {}
     
     # Nombre total de mémoires
-    stats['total_memoires'] = pd.read_sql_query(adapt_query("SELECT COUNT(*) as count FROM memoires", db.config['db_type']), db.conn).iloc[0]['count']
+    stats['total_memoires'] = int(cube['count'].sum())
     
     # Nombre de mémoires par entité
-    stats['memoires_par_entite'] = pd.read_sql_query(adapt_query("""
-    SELECT e.nom, COUNT(*) as count 
-    FROM memoires m
-    JOIN filieres f ON m.filiere_id = f.id
-    JOIN entites e ON f.entite_id = e.id
-    GROUP BY e.nom
-    ORDER BY count DESC
-    """, db.config['db_type']), db.conn)
+    stats['memoires_par_entite'] = (
+        _count_by(cube, 'entite', 'nom').sort_values('count', ascending=False).reset_index(drop=True)
+    )
     
     # Nombre de mémoires par année
-    stats['memoires_par_annee'] = pd.read_sql_query(adapt_query("""
-    SELECT s.annee_universitaire, COUNT(*) as count 
-    FROM memoires m
-    JOIN sessions s ON m.session_id = s.id
-    GROUP BY s.annee_universitaire
-    ORDER BY s.annee_universitaire DESC
-    """, db.config['db_type']), db.conn)
+    stats['memoires_par_annee'] = (
+        _count_by(cube, 'annee', 'annee_universitaire')
+        .sort_values('annee_universitaire', ascending=False).reset_index(drop=True)
+    )
     
     # Nombre de mémoires par filière
-    stats['memoires_par_filiere'] = pd.read_sql_query(adapt_query("""
-    SELECT f.nom, COUNT(*) as count 
-    FROM memoires m
-    JOIN filieres f ON m.filiere_id = f.id
-    GROUP BY f.nom
-    ORDER BY count DESC
-    LIMIT 10
-    """, db.config['db_type']), db.conn)
+    stats['memoires_par_filiere'] = _count_by(cube, 'filiere', 'nom').nlargest(10, 'count').reset_index(drop=True)
     
-    db.close()
     return stats
 
+def pivot_statistics(cube, rows='entite', columns='annee', totals=True):
+    """Tableau croisé (par défaut entité × année) extrait du cube."""
+    if cube.empty:
+        return pd.DataFrame()
+    table = cube.pivot_table(
+        index=rows, columns=columns, values='count', aggfunc='sum', fill_value=0,
+        margins=totals, margins_name='Total'
+    )
+    return table.astype('int64')
+
 # Fonction pour afficher un PDF intégré
 def display_pdf(file_path):
     """Affiche un PDF dans l'interface."""
@@ -603,21 +910,29 @@ def display_pdf(file_path):
         st.error(f"Erreur lors de l'affichage du PDF: {str(e)}")
 
 # Fonction pour créer un lien de téléchargement
-def get_download_link(file_path, label):
+# Fonction pour construire le nom d'un PDF téléchargé à partir du titre du mémoire
+def download_filename(titre):
+    """Nom de fichier lisible et sûr (le chemin stocké n'est qu'une empreinte)."""
+    ascii_title = unicodedata.normalize('NFKD', titre or '').encode('ascii', 'ignore').decode()
+    name = re.sub(r'[^\w-]+', '_', ascii_title).strip('_')[:100].rstrip('_')
+    return f"{name or 'memoire'}.pdf"
+
+def get_download_link(file_path, label, titre=None, key=None):
     """Crée un lien de téléchargement pour un fichier PDF."""
     try:
         if file_path.startswith("local://"):
             # Récupérer le contenu du fichier depuis le stockage local
             file_content = storage.get_file(file_path)
             if file_content:
-                # Extraire le nom du fichier original
-                filename = os.path.basename(file_path.replace("local://", ""))
+                # Nommer le fichier d'après le titre du mémoire
+                filename = download_filename(titre)
                 # Utiliser le composant de téléchargement natif de Streamlit
                 return st.download_button(
                     label=label,
                     data=file_content,
                     file_name=filename,
-                    mime="application/pdf"
+                    mime="application/pdf",
+                    key=key
                 )
             else:
                 st.error("Impossible de récupérer le fichier PDF")
@@ -661,271 +976,98 @@ def update_password(email, new_password):
         return False, f"Erreur lors de la mise à jour du mot de passe: {str(e)}"
 
 # Fonction pour rechercher dans le contenu des PDFs
-def search_in_pdf_content(query):
-    """Recherche dans le contenu des PDFs."""
-    if not query:
+def search_in_pdf_content(query, limit=20):
+    """Recherche plein texte dans les pages des PDFs.
+
+    Retourne une ligne par mémoire : sa page la mieux classée (`page_num`),
+    la liste de toutes les pages trouvées (`pages`) et un extrait surligné
+    (`context`) produit par la base, sans jamais lire le texte complet.
+    """
+    db_type = db.config['db_type']
+    fts_query = build_fulltext_query(query, db_type) if query else None
+    if not fts_query:
         return pd.DataFrame()
     
-    db.connect()
-    search_query = f"%{query}%"
-    
-    try:
+    if db_type == 'sqlite':
+        # bm25 est négatif : plus petit = plus pertinent
         sql = """
-        SELECT DISTINCT m.id, m.titre, m.auteurs, m.encadreur, m.resume, m.fichier_url, 
-               m.tags, f.nom as filiere_nom, s.annee_universitaire, m.version, 
-               m.date_ajout, e.nom as entite_nom,
-               pc.page_num,
-               pc.content as full_content,
-               substr(pc.content, max(0, instr(lower(pc.content), lower(%s)) - 100), 200) as context
-        FROM memoires m
+        WITH hits AS (
+            SELECT pc.id, pc.memoire_id, pc.page_num, -bm25(pdf_content_fts) as score
+            FROM pdf_content_fts
+            JOIN pdf_content pc ON pc.id = pdf_content_fts.rowid
+            WHERE pdf_content_fts MATCH %s
+        ), ranked AS (
+            SELECT hits.*,
+                   ROW_NUMBER() OVER (PARTITION BY memoire_id ORDER BY score DESC, page_num) as rang,
+                   group_concat(page_num) OVER (PARTITION BY memoire_id) as pages
+            FROM hits
+        ), best AS (
+            SELECT * FROM ranked WHERE rang = 1 ORDER BY score DESC LIMIT %s
+        )
+        SELECT """ + SEARCH_COLUMNS.format(resume="m.resume") + """,
+               best.page_num, best.pages, best.score,
+               snippet(pdf_content_fts, 0, '**', '**', '…', 24) as context
+        FROM best
+        JOIN pdf_content_fts ON pdf_content_fts.rowid = best.id
+        JOIN memoires m ON m.id = best.memoire_id
         JOIN filieres f ON m.filiere_id = f.id
         JOIN sessions s ON m.session_id = s.id
         JOIN entites e ON f.entite_id = e.id
-        JOIN pdf_content pc ON m.id = pc.memoire_id
-        WHERE lower(pc.content) LIKE lower(%s)
-        ORDER BY m.date_ajout DESC
+        WHERE pdf_content_fts MATCH %s
+        ORDER BY best.score DESC
         """
-        
-        df = pd.read_sql_query(adapt_query(sql, db.config['db_type']), db.conn, params=(query, search_query))
-        
-        if not df.empty:
-            # Améliorer l'affichage du contexte
-            def highlight_context(row):
-                text = row['full_content']
-                query_lower = query.lower()
-                start_idx = text.lower().find(query_lower)
-                if start_idx != -1:
-                    start = max(0, start_idx - 100)
-                    end = min(len(text), start_idx + len(query) + 100)
-                    context = text[start:end]
-                    # Mettre en évidence le terme recherché
-                    context = context.replace(query, f"**{query}**")
-                    return f"...{context}..."
-                return row['context']
-            
-            df['context'] = df.apply(highlight_context, axis=1)
-            df = df.drop('full_content', axis=1)
-        
-        db.close()
+        params = (fts_query, limit, fts_query)
+    else:
+        # ts_headline n'est calculé que pour les pages retenues
+        sql = """
+        WITH q AS (SELECT to_tsquery('french', %s) as q),
+        hits AS (
+            SELECT pc.id, pc.memoire_id, pc.page_num, ts_rank_cd(pc.search_vector, q.q) as score
+            FROM pdf_content pc, q
+            WHERE pc.search_vector @@ q.q
+        ), best AS (
+            SELECT DISTINCT ON (memoire_id) id, memoire_id, page_num, score,
+                   string_agg(page_num::text, ',') OVER (PARTITION BY memoire_id) as pages
+            FROM hits
+            ORDER BY memoire_id, score DESC, page_num
+        ), top AS (
+            SELECT * FROM best ORDER BY score DESC LIMIT %s
+        )
+        SELECT """ + SEARCH_COLUMNS.format(resume="m.resume") + """,
+               top.page_num, top.pages, top.score,
+               ts_headline('french', pc.content, q.q,
+                           'StartSel=**, StopSel=**, MaxWords=35, MinWords=15, MaxFragments=2') as context
+        FROM top
+        CROSS JOIN q
+        JOIN pdf_content pc ON pc.id = top.id
+        JOIN memoires m ON m.id = top.memoire_id
+        JOIN filieres f ON m.filiere_id = f.id
+        JOIN sessions s ON m.session_id = s.id
+        JOIN entites e ON f.entite_id = e.id
+        ORDER BY top.score DESC
+        """
+        params = (fts_query, limit)
+    
+    db.connect()
+    try:
+        df = pd.read_sql_query(adapt_query(sql, db_type), db.conn, params=params)
+        df['pages'] = df['pages'].map(lambda pages: sorted(int(page) for page in pages.split(',')))
         return df
     except Exception as e:
         st.error(f"Erreur lors de la recherche dans le contenu PDF : {str(e)}")
-        db.close()
         return pd.DataFrame()
-
-def bulk_import_memoires(metadata_file, pdf_folder):
-    """
-    Importe en masse des mémoires à partir d'un fichier Excel/CSV et d'un dossier de PDFs.
-    
-    Le fichier Excel/CSV doit contenir les colonnes suivantes:
-    - titre
-    - auteurs
-    - encadreur
-    - resume
-    - tags
-    - filiere_nom (nom exact de la filière)
-    - annee_universitaire (doit exister dans la base)
-    - version (optionnel)
-    - nom_fichier (nom du fichier PDF dans le dossier)
-    """
-    try:
-        # Lecture du fichier de métadonnées
-        if metadata_file.name.endswith('.csv'):
-            df = pd.read_csv(metadata_file)
-        else:
-            df = pd.read_excel(metadata_file)
-        
-        db.connect()
-        c = db.cursor
-        filieres_map = {row['nom']: row['id'] for row in pd.read_sql_query(adapt_query('SELECT id, nom FROM filieres', db.config['db_type']), db.conn).to_dict('records')}
-        sessions_map = {row['annee_universitaire']: row['id'] for row in pd.read_sql_query(adapt_query('SELECT id, annee_universitaire FROM sessions', db.config['db_type']), db.conn).to_dict('records')}
-        storage = FileStorage()
-        success_count = 0
-        error_count = 0
-        errors = []
-        for idx, row in df.iterrows():
-            try:
-                pdf_path = os.path.join(pdf_folder, row['nom_fichier'])
-                if not os.path.exists(pdf_path):
-                    raise ValueError(f"Ligne {idx+2}: Fichier PDF '{row['nom_fichier']}' non trouvé")
-                with open(pdf_path, 'rb') as pdf_file:
-                    new_filename = f"{uuid.uuid4()}.pdf"
-                    success, stored_path = storage.save_file(pdf_file, new_filename)
-                    if not success:
-                        raise ValueError(f"Ligne {idx+2}: Erreur lors de l'enregistrement du PDF")
-                date_now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                query = """
-                    INSERT INTO memoires 
-                    (titre, auteurs, encadreur, resume, fichier_url, tags, filiere_id, session_id, version, date_ajout)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                c.execute(adapt_query(query, db.config['db_type']), (
-                    row['titre'],
-                    row['auteurs'],
-                    row['encadreur'],
-                    row['resume'],
-                    stored_path,
-                    row.get('tags', ''),
-                    filieres_map[row['filiere_nom']],
-                    sessions_map[row['annee_universitaire']],
-                    row.get('version', ''),
-                    date_now
-                ))
-                success_count += 1
-            except Exception as e:
-                error_count += 1
-                errors.append(str(e))
-                continue
-        db.conn.commit()
-        db.close()
-        return True, {
-            'success_count': success_count,
-            'error_count': error_count,
-            'errors': errors
-        }
-    except Exception as e:
-        db.close()
-        return False, str(e)
-
-def bulk_import_structure_and_memoires(structure_file, metadata_file, pdf_folder):
-    """
-    Importe la structure complète (entités, filières, sessions) et les mémoires.
-    
-    Le fichier structure_file (Excel/CSV) doit contenir 3 feuilles/fichiers :
-    - entites: nom
-    - filieres: nom, entite_nom
-    - sessions: annee_universitaire
-    """
-    try:
-        db.connect()
-        c = db.cursor
-        # 1. Import des entités
-        if structure_file.name.endswith('.csv'):
-            entites_df = pd.read_csv(structure_file)
-        else:
-            entites_df = pd.read_excel(structure_file, sheet_name='entites')
-        
-        entites_map = {}  # Pour stocker les IDs des entités créées
-        for _, row in entites_df.iterrows():
-            try:
-                c.execute(adapt_query("INSERT INTO entites (nom) VALUES (%s)", db.config['db_type']), (row['nom'],))
-                entites_map[row['nom']] = c.lastrowid
-            except Exception:
-                # Si l'entité existe déjà, récupérer son ID
-                c.execute(adapt_query("SELECT id FROM entites WHERE nom=%s", db.config['db_type']), (row['nom'],))
-                entites_map[row['nom']] = c.fetchone()[0]
-        
-        # 2. Import des filières
-        if structure_file.name.endswith('.csv'):
-            filieres_df = pd.read_csv(structure_file)
-        else:
-            filieres_df = pd.read_excel(structure_file, sheet_name='filieres')
-        
-        filieres_map = {}  # Pour stocker les IDs des filières créées
-        for _, row in filieres_df.iterrows():
-            try:
-                entite_id = entites_map[row['entite_nom']]
-                c.execute(adapt_query("INSERT INTO filieres (nom, entite_id) VALUES (%s, %s)", db.config['db_type']), (row['nom'], entite_id))
-                filieres_map[row['nom']] = c.lastrowid
-            except Exception:
-                # Si la filière existe déjà, récupérer son ID
-                c.execute(adapt_query("SELECT id FROM filieres WHERE nom=%s AND entite_id=%s", db.config['db_type']), (row['nom'], entite_id))
-                filieres_map[row['nom']] = c.fetchone()[0]
-        
-        # 3. Import des sessions
-        if structure_file.name.endswith('.csv'):
-            sessions_df = pd.read_csv(structure_file)
-        else:
-            sessions_df = pd.read_excel(structure_file, sheet_name='sessions')
-        
-        sessions_map = {}  # Pour stocker les IDs des sessions créées
-        for _, row in sessions_df.iterrows():
-            try:
-                c.execute(adapt_query("INSERT INTO sessions (annee_universitaire) VALUES (%s)", db.config['db_type']), (row['annee_universitaire'],))
-                sessions_map[row['annee_universitaire']] = c.lastrowid
-            except Exception:
-                # Si la session existe déjà, récupérer son ID
-                c.execute(adapt_query("SELECT id FROM sessions WHERE annee_universitaire=%s", db.config['db_type']), (row['annee_universitaire'],))
-                sessions_map[row['annee_universitaire']] = c.fetchone()[0]
-        
-        # 4. Import des mémoires
-        if metadata_file.name.endswith('.csv'):
-            memoires_df = pd.read_csv(metadata_file)
-        else:
-            memoires_df = pd.read_excel(metadata_file)
-        
-        success_count = 0
-        error_count = 0
-        errors = []
-        
-        for idx, row in memoires_df.iterrows():
-            try:
-                # Vérification des champs obligatoires
-                if pd.isna(row['titre']) or pd.isna(row['auteurs']) or pd.isna(row['encadreur']) or \
-                   pd.isna(row['resume']) or pd.isna(row['filiere_nom']) or \
-                   pd.isna(row['annee_universitaire']) or pd.isna(row['nom_fichier']):
-                    raise ValueError(f"Ligne {idx+2}: Champs obligatoires manquants")
-                
-                # Vérification du fichier PDF
-                pdf_path = os.path.join(pdf_folder, row['nom_fichier'])
-                if not os.path.exists(pdf_path):
-                    raise ValueError(f"Ligne {idx+2}: Fichier PDF '{row['nom_fichier']}' non trouvé")
-                
-                # Copie et enregistrement du PDF
-                with open(pdf_path, 'rb') as pdf_file:
-                    new_filename = f"{uuid.uuid4()}.pdf"
-                    success, stored_path = storage.save_file(pdf_file, new_filename)
-                    
-                    if not success:
-                        raise ValueError(f"Ligne {idx+2}: Erreur lors de l'enregistrement du PDF")
-                
-                # Insertion du mémoire
-                date_now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                c.execute(adapt_query("""
-                INSERT INTO memoires 
-                (titre, auteurs, encadreur, resume, fichier_url, tags, filiere_id, session_id, version, date_ajout)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, db.config['db_type']), (
-                    row['titre'],
-                    row['auteurs'],
-                    row['encadreur'],
-                    row['resume'],
-                    stored_path,
-                    row.get('tags', ''),
-                    filieres_map[row['filiere_nom']],
-                    sessions_map[row['annee_universitaire']],
-                    row.get('version', ''),
-                    date_now
-                ))
-                
-                success_count += 1
-                
-            except Exception as e:
-                error_count += 1
-                errors.append(str(e))
-                continue
-        
-        db.conn.commit()
-        db.close()
-        
-        return True, {
-            'entites_count': len(entites_map),
-            'filieres_count': len(filieres_map),
-            'sessions_count': len(sessions_map),
-            'memoires_success': success_count,
-            'memoires_error': error_count,
-            'errors': errors
-        }
-        
-    except Exception as e:
+    finally:
         db.close()
-        if 'conn' in locals():
-            conn.close()
-        return False, str(e)
 
 # Initialiser la base de données
 init_db()
 
+# Démarrer l'extraction du texte des PDF (reprend les extractions interrompues)
+get_pipeline(storage.get_file)
+
+# Démarrer l'exécuteur des imports (signale ceux interrompus par un redémarrage)
+get_import_runner()
+
 # Session state pour l'authentification
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
@@ -1251,7 +1393,7 @@ def show_home_page():
     st.write("Bienvenue sur la plateforme centrale des mémoires de soutenance de l'université.")
     
     st.subheader("Derniers mémoires ajoutés")
-    latest_memoires = get_all_memoires().head(5)
+    latest_memoires = get_latest_memoires(5)
     
     if len(latest_memoires) == 0:
         st.info("Aucun mémoire n'a encore été ajouté.")
@@ -1307,7 +1449,7 @@ def show_memoire_details(memoire_id):
     if memoire['fichier_url'].startswith("local://"):
         action_col1, action_col2 = st.columns(2)
         with action_col1:
-            st.markdown(get_download_link(memoire['fichier_url'], "📥 Télécharger le PDF"), unsafe_allow_html=True)
+            get_download_link(memoire['fichier_url'], "📥 Télécharger le PDF", memoire['titre'])
         with action_col2:
             if st.button("📄 Consulter en ligne"):
                 display_pdf(memoire['fichier_url'])
@@ -1330,23 +1472,25 @@ def show_search_page():
         with st.expander("Filtres avancés"):
             filter_col1, filter_col2, filter_col3 = st.columns(3)
             
+            # Les listes viennent du cache de référence (aucune requête)
+            ref = get_reference_data()
+            
             # Filtre par entité
-            entities = get_all_entities()
-            entity_options = [("", "Toutes les entités")] + [(str(row['id']), row['nom']) for _, row in entities.iterrows()]
+            entity_labels = {"": "Toutes les entités", **{str(id): nom for id, nom in ref.entity_names.items()}}
             with filter_col1:
                 selected_entity = st.selectbox("Entité", 
-                                              options=[id for id, _ in entity_options],
-                                              format_func=lambda x: next((name for id, name in entity_options if id == x), ""),
+                                              options=list(entity_labels),
+                                              format_func=entity_labels.get,
                                               key="search_entity")
             
             # Filtre par filière (dynamique en fonction de l'entité)
             with filter_col2:
                 if selected_entity:
-                    filieres = get_filieres_by_entity(selected_entity)
-                    filiere_options = [("", "Toutes les filières")] + [(str(row['id']), row['nom']) for _, row in filieres.iterrows()]
+                    filieres = ref.filieres_of(selected_entity)
+                    filiere_labels = {"": "Toutes les filières", **{str(id): nom for id, nom in zip(filieres['id'], filieres['nom'])}}
                     selected_filiere = st.selectbox("Filière", 
-                                                   options=[id for id, _ in filiere_options],
-                                                   format_func=lambda x: next((name for id, name in filiere_options if id == x), ""),
+                                                   options=list(filiere_labels),
+                                                   format_func=filiere_labels.get,
                                                    key="search_filiere")
                 else:
                     selected_filiere = None
@@ -1354,25 +1498,53 @@ def show_search_page():
             
             # Filtre par année
             with filter_col3:
-                sessions = get_all_sessions()
-                session_options = [("", "Toutes les années")] + [(str(row['id']), row['annee_universitaire']) for _, row in sessions.iterrows()]
+                session_labels = {"": "Toutes les années", **{str(id): annee for id, annee in ref.session_names.items()}}
                 selected_session = st.selectbox("Année universitaire", 
-                                               options=[id for id, _ in session_options],
-                                               format_func=lambda x: next((name for id, name in session_options if id == x), ""),
+                                               options=list(session_labels),
+                                               format_func=session_labels.get,
                                                key="search_session")
         
         # Exécution de la recherche
         if search_button or search_query:
-            results = search_memoires(search_query, 
-                                    selected_entity if selected_entity else None,
-                                    selected_filiere if selected_filiere else None,
-                                    selected_session if selected_session else None)
+            # Nouvelle recherche : repartir de la première page
+            search_key = (search_query, selected_entity, selected_filiere, selected_session)
+            if st.session_state.get('search_key') != search_key:
+                st.session_state.search_key = search_key
+                st.session_state.search_cursors = [None]  # curseur de début de chaque page visitée
+                st.session_state.search_total = None
+            cursors = st.session_state.search_cursors
+            
+            page = search_memoires_page(search_query, 
+                                        selected_entity if selected_entity else None,
+                                        selected_filiere if selected_filiere else None,
+                                        selected_session if selected_session else None,
+                                        page_size=SEARCH_PAGE_SIZE,
+                                        after=cursors[-1],
+                                        with_total=st.session_state.search_total is None)
+            if page['total'] is not None:
+                st.session_state.search_total = page['total']
+            total = st.session_state.search_total
+            results = page['results']
             
-            st.subheader(f"Résultats ({len(results)} mémoires trouvés)")
+            st.subheader(f"Résultats ({total} mémoires trouvés)")
             
             if len(results) == 0:
                 st.info("Aucun mémoire ne correspond à votre recherche.")
             else:
+                # Navigation entre les pages
+                total_pages = max(1, (total + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE)
+                nav_col1, nav_col2, nav_col3 = st.columns([1, 3, 1])
+                with nav_col1:
+                    if st.button("◀️ Précédent", key="search_prev", disabled=len(cursors) == 1):
+                        cursors.pop()
+                        st.rerun()
+                with nav_col2:
+                    st.write(f"Page {len(cursors)}/{total_pages}")
+                with nav_col3:
+                    if st.button("Suivant ▶️", key="search_next", disabled=page['next_cursor'] is None):
+                        cursors.append(page['next_cursor'])
+                        st.rerun()
+                
                 # Utiliser des conteneurs séparés pour chaque mémoire
                 for idx, memoire in results.iterrows():
                     memoire_container = st.container()
@@ -1392,7 +1564,7 @@ def show_search_page():
                                 if memoire['fichier_url'].startswith("local://"):
                                     file_content = storage.get_file(memoire['fichier_url'])
                                     if file_content:
-                                        filename = os.path.basename(memoire['fichier_url'].replace("local://", ""))
+                                        filename = download_filename(memoire['titre'])
                                         st.download_button(
                                             "📥 Télécharger le PDF",
                                             data=file_content,
@@ -1410,12 +1582,24 @@ def show_search_page():
                             if st.session_state.get(f"show_pdf_{memoire['id']}", False):
                                 display_pdf(memoire['fichier_url'])
 
+            # Recherche dans le texte intégral des PDFs
+            if search_query:
+                pdf_results = search_in_pdf_content(search_query)
+                if not pdf_results.empty:
+                    st.subheader(f"Dans le texte des mémoires ({len(pdf_results)} mémoires)")
+                    for _, memoire in pdf_results.iterrows():
+                        pages = ", ".join(str(page) for page in memoire['pages'])
+                        with st.expander(f"{memoire['titre']} - {memoire['auteurs']} ({memoire['annee_universitaire']})"):
+                            st.markdown(f"**Page {memoire['page_num']} :** {memoire['context']}")
+                            st.caption(f"Pages concernées : {pages}")
+
 def show_statistics_page():
     st.header("📊 Statistiques")
     st.markdown("---")
     container = st.container()
     with container:
-        stats = get_statistics()
+        cube = get_statistics_cube()
+        stats = get_statistics(cube)
         
         st.subheader("Vue d'ensemble")
         st.info(f"Total des mémoires disponibles : {stats['total_memoires']}")
@@ -1443,6 +1627,25 @@ def show_statistics_page():
                 st.bar_chart(chart_data.set_index('annee_universitaire'))
             else:
                 st.info("Aucune donnée disponible")
+        
+        if cube.empty:
+            return
+        
+        st.markdown("---")
+        st.subheader("Répartition croisée")
+        dimensions = {'entite': "Entité", 'filiere': "Filière"}
+        rows = st.radio("Lignes", options=list(dimensions), format_func=dimensions.get,
+                        horizontal=True, key="stats_rows")
+        st.dataframe(pivot_statistics(cube, rows=rows), use_container_width=True)
+        
+        st.subheader("Détail par entité")
+        entity_names = dict(zip(cube['entite_id'], cube['entite']))
+        entity_ids = sorted(entity_names, key=entity_names.get)
+        selected_entity = st.selectbox("Entité", options=entity_ids,
+                                       format_func=entity_names.get, key="stats_entity")
+        detail = pivot_statistics(cube[cube['entite_id'] == selected_entity], rows='filiere', totals=False)
+        # Barres empilées : une couleur par année universitaire
+        st.bar_chart(detail)
 
 def show_entities_management():
     st.header("🏢 Gestion des Entités")
@@ -1512,17 +1715,16 @@ def show_filieres_management():
             st.subheader("Ajouter une filière")
             
             # Sélection de l'entité parente
-            entities = get_all_entities()
-            if entities.empty:
+            entity_names = get_reference_data().entity_names
+            if not entity_names:
                 st.warning("Vous devez d'abord ajouter des entités.")
                 if st.button("Aller à la gestion des entités"):
                     show_entities_management()
                     return
             else:
-                entity_options = [(row['id'], row['nom']) for _, row in entities.iterrows()]
                 selected_entity = st.selectbox("Entité parente", 
-                                              options=[id for id, _ in entity_options],
-                                              format_func=lambda x: next((name for id, name in entity_options if id == x), ""),
+                                              options=list(entity_names),
+                                              format_func=entity_names.get,
                                               key="parent_entity")
                 
                 # Nom de la filière
@@ -1622,6 +1824,147 @@ def show_sessions_management():
                             else:
                                 st.error(message)
 
+# Fonction pour lancer un import en arrière-plan
+def submit_import(kind, files, pdf_folder):
+    try:
+        success, result = get_import_runner().submit(kind, files, pdf_folder)
+    except Exception as e:
+        st.error(f"Erreur lors du lancement de l'import : {str(e)}")
+        return
+    if success:
+        # Seuls les imports lancés par cette session tiennent sa page en actualisation
+        st.session_state.setdefault('import_job_ids', []).append(result)
+        st.success(
+            f"Import n°{result} lancé en arrière-plan : son avancement s'affiche dans le suivi des imports. "
+            "Vous pouvez quitter cette page, l'import continue."
+        )
+    else:
+        st.warning(result)
+
+# Fonction pour retrouver le fichier de métadonnées et les PDFs d'un import
+def resolve_import_files(source, archive, metadata_file, pdf_folder):
+    """Retourne (fichier de métadonnées, source des PDFs, message d'erreur)."""
+    if source == IMPORT_SOURCE_ZIP:
+        if not archive:
+            return None, None, "Veuillez sélectionner une archive ZIP"
+        try:
+            metadata_file, pdf_source = open_archive(archive)
+        except (ValueError, zipfile.BadZipFile) as e:
+            return None, None, f"Archive invalide : {str(e)}"
+        return metadata_file, pdf_source, None
+    if not metadata_file:
+        return None, None, "Veuillez sélectionner un fichier de métadonnées"
+    if not pdf_folder:
+        return None, None, "Veuillez indiquer le chemin du dossier des PDFs"
+    if not os.path.exists(pdf_folder):
+        return None, None, "Le dossier spécifié n'existe pas"
+    return metadata_file, pdf_folder, None
+
+# Fonction pour afficher le résultat d'un import à blanc
+def show_validation_report(success, report):
+    if not success:
+        st.error(f"Erreur lors de la vérification : {report}")
+        return
+    st.info(f"""
+    Vérification terminée, rien n'a été importé :
+    - Lignes du fichier : {report['total']}
+    - Lignes valides : {report['valid_count']} (dont {report['skipped_count']} déjà importées ou en double)
+    - Erreurs : {report['error_count']}
+    - PDFs à copier : {report['bytes_to_copy'] / (1024 * 1024):.1f} Mo
+    """)
+    if report['errors']:
+        st.dataframe(pd.DataFrame({'Erreurs': report['errors']}), use_container_width=True, hide_index=True)
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600} h {seconds % 3600 // 60:02d} min"
+    if seconds >= 60:
+        return f"{seconds // 60} min {seconds % 60:02d} s"
+    return f"{seconds} s"
+
+# Fonction pour afficher le suivi des imports en arrière-plan
+def show_import_jobs():
+    """Affiche le suivi des imports ; retourne l'emplacement du panneau (ou None)."""
+    try:
+        jobs = list_import_jobs()
+    except Exception as e:
+        st.error(f"Erreur lors de la récupération des imports : {str(e)}")
+        return None
+    if jobs.empty:
+        return None
+    
+    active = jobs['statut'].isin([JOB_EN_ATTENTE, JOB_EN_COURS]).any()
+    with st.expander("📥 Suivi des imports", expanded=bool(active)):
+        st.checkbox("Actualisation automatique", value=True, key="imports_auto_refresh")
+        panel = st.empty()
+        with panel.container():
+            render_import_jobs(jobs)
+    return panel
+
+# Fonction pour actualiser le seul panneau de suivi pendant un import
+def watch_import_jobs(panel, job_ids):
+    """Actualise le panneau tant qu'un des imports `job_ids` est en cours.
+
+    Seul le panneau est redessiné, au plus IMPORT_REFRESH_ROUNDS fois avant
+    une réexécution de la page ; la connexion du rerun est rendue au pool
+    pendant chaque attente.
+    """
+    runner = get_import_runner()
+    for _ in range(IMPORT_REFRESH_ROUNDS):
+        if not runner.running(job_ids):
+            break
+        db.release_scope()
+        time.sleep(IMPORT_REFRESH_SECONDS)
+        jobs = list_import_jobs()
+        with panel.container():
+            render_import_jobs(jobs)
+    db.release_scope()
+    # Import terminé (ou série d'actualisations écoulée) : réexécution pour
+    # afficher les nouveaux mémoires
+    st.rerun()
+
+# Fonction pour afficher l'avancement de chaque import
+def render_import_jobs(jobs):
+    for _, job in jobs.iterrows():
+        st.markdown(
+            f"**{IMPORT_TYPE_LABELS.get(job['type'], job['type'])} n°{job['id']}** — "
+            f"{IMPORT_JOB_LABELS.get(job['statut'], job['statut'])} "
+            f"<small>(créé le {job['date_creation']})</small>",
+            unsafe_allow_html=True
+        )
+        fraction, rate, remaining = job_progress(job)
+        if job['statut'] == JOB_EN_COURS and pd.isna(job['nb_lignes']):
+            st.caption(f"{job['nb_traites']} lignes traitées (nombre total inconnu)")
+        elif not pd.isna(job['nb_lignes']):
+            st.progress(fraction, text=f"{job['nb_traites']}/{int(job['nb_lignes'])} lignes traitées")
+            details = [
+                f"{job['nb_importes']} importés",
+                f"{job['nb_ignores']} ignorés (déjà importés ou en double)",
+                f"{job['nb_erreurs']} erreurs",
+            ]
+            if rate is not None:
+                details.append(f"{rate:.1f} lignes/s")
+            if job['statut'] == JOB_EN_COURS and remaining is not None:
+                details.append(f"fin estimée dans {_format_duration(remaining)}")
+            st.caption(" · ".join(details))
+        
+        if pd.notna(job['erreur']):
+            st.error(job['erreur'])
+        if pd.notna(job['resultat']):
+            result = json.loads(job['resultat'])
+            if 'created' in result:
+                st.caption(
+                    f"Structure : {result['entites_count']} entités (dont {result['created']['entites']} nouvelles), "
+                    f"{result['filieres_count']} filières (dont {result['created']['filieres']} nouvelles), "
+                    f"{result['sessions_count']} sessions (dont {result['created']['sessions']} nouvelles)"
+                )
+            if result['errors']:
+                st.dataframe(
+                    pd.DataFrame({'Erreurs': result['errors']}),
+                    use_container_width=True, hide_index=True, height=150
+                )
+
 def show_memoires_management():
     st.header("📚 Gestion des Mémoires")
     st.markdown("---")
@@ -1650,51 +1993,49 @@ def show_memoires_management():
                     col1, col2 = st.columns(2)
                     with col1:
                         # Sélection de l'entité et filière
-                        entities = get_all_entities()
-                        entity_options = [(row['id'], row['nom']) for _, row in entities.iterrows()]
+                        ref = get_reference_data()
+                        entity_ids = list(ref.entity_names)
                         
                         # Trouver l'entité actuelle
-                        current_entity = next((ent[0] for ent in entity_options if ent[1] == memoire['entite_nom']), None)
+                        current_entity = next(
+                            (id for id, nom in ref.entity_names.items() if nom == memoire['entite_nom']), None
+                        )
                         
                         selected_entity = st.selectbox(
                             "Entité",
-                            options=[id for id, _ in entity_options],
-                            format_func=lambda x: next((name for id, name in entity_options if id == x), ""),
+                            options=entity_ids,
+                            format_func=ref.entity_names.get,
                             key="edit_entity",
-                            index=entity_options.index((current_entity, memoire['entite_nom'])) if current_entity else 0
+                            index=entity_ids.index(current_entity) if current_entity in entity_ids else 0
                         )
                         
                         # Filières de l'entité sélectionnée
-                        filieres = get_filieres_by_entity(selected_entity)
-                        filiere_options = [(row['id'], row['nom']) for _, row in filieres.iterrows()]
+                        filiere_ids = [int(id) for id in ref.filieres_of(selected_entity)['id']]
                         
                         # Trouver la filière actuelle
-                        current_filiere = memoire['filiere_id']
-                        filiere_index = next((i for i, (id, _) in enumerate(filiere_options) if id == current_filiere), 0)
+                        current_filiere = int(memoire['filiere_id'])
                         
                         selected_filiere = st.selectbox(
                             "Filière",
-                            options=[id for id, _ in filiere_options],
-                            format_func=lambda x: next((name for id, name in filiere_options if id == x), ""),
+                            options=filiere_ids,
+                            format_func=ref.filiere_names.get,
                             key="edit_filiere",
-                            index=filiere_index
+                            index=filiere_ids.index(current_filiere) if current_filiere in filiere_ids else 0
                         )
                     
                     with col2:
                         # Sélection de la session
-                        sessions = get_all_sessions()
-                        session_options = [(row['id'], row['annee_universitaire']) for _, row in sessions.iterrows()]
+                        session_ids = list(ref.session_names)
                         
                         # Trouver la session actuelle
-                        current_session = memoire['session_id']
-                        session_index = next((i for i, (id, _) in enumerate(session_options) if id == current_session), 0)
+                        current_session = int(memoire['session_id'])
                         
                         selected_session = st.selectbox(
                             "Année universitaire",
-                            options=[id for id, _ in session_options],
-                            format_func=lambda x: next((name for id, name in session_options if id == x), ""),
+                            options=session_ids,
+                            format_func=ref.session_names.get,
                             key="edit_session",
-                            index=session_index
+                            index=session_ids.index(current_session) if current_session in session_ids else 0
                         )
                         
                         version = st.text_input("Version", value=memoire['version'])
@@ -1745,6 +2086,9 @@ def show_memoires_management():
                 
                 return
 
+        # Suivi des imports en arrière-plan
+        import_panel = show_import_jobs()
+        
         # Sinon, afficher les onglets
         tab1, tab2, tab3, tab4 = st.tabs(["Ajouter un mémoire", "Import en masse", "Import complet", "Liste des mémoires"])
         
@@ -1752,16 +2096,15 @@ def show_memoires_management():
             st.subheader("Ajouter un nouveau mémoire")
             
             # Vérifier si les éléments nécessaires existent
-            entities = get_all_entities()
-            sessions = get_all_sessions()
+            ref = get_reference_data()
             
-            if entities.empty or sessions.empty:
-                if entities.empty:
+            if not ref.entity_names or not ref.session_names:
+                if not ref.entity_names:
                     st.warning("Vous devez d'abord ajouter des entités.")
                     if st.button("Aller à la gestion des entités", key="goto_entities"):
                         show_entities_management()
                         return
-                if sessions.empty:
+                if not ref.session_names:
                     st.warning("Vous devez d'abord ajouter des sessions (années universitaires).")
                     if st.button("Aller à la gestion des sessions", key="goto_sessions"):
                         show_sessions_management()
@@ -1779,30 +2122,27 @@ def show_memoires_management():
                     
                     with col1:
                         # Sélection de l'entité et filière
-                        entity_options = [(row['id'], row['nom']) for _, row in entities.iterrows()]
                         selected_entity = st.selectbox("Entité", 
-                                                    options=[id for id, _ in entity_options],
-                                                    format_func=lambda x: next((name for id, name in entity_options if id == x), ""),
+                                                    options=list(ref.entity_names),
+                                                    format_func=ref.entity_names.get,
                                                     key="add_entity")
                         
-                        filieres = get_filieres_by_entity(selected_entity)
+                        filieres = ref.filieres_of(selected_entity)
                         
                         if filieres.empty:
                             st.warning(f"Aucune filière n'est associée à cette entité. Veuillez en ajouter.")
                             selected_filiere = None
                         else:
-                            filiere_options = [(row['id'], row['nom']) for _, row in filieres.iterrows()]
                             selected_filiere = st.selectbox("Filière", 
-                                                        options=[id for id, _ in filiere_options],
-                                                        format_func=lambda x: next((name for id, name in filiere_options if id == x), ""),
+                                                        options=[int(id) for id in filieres['id']],
+                                                        format_func=ref.filiere_names.get,
                                                         key="add_filiere")
                     
                     with col2:
                         # Sélection de la session
-                        session_options = [(row['id'], row['annee_universitaire']) for _, row in sessions.iterrows()]
                         selected_session = st.selectbox("Année universitaire", 
-                                                    options=[id for id, _ in session_options],
-                                                    format_func=lambda x: next((name for id, name in session_options if id == x), ""),
+                                                    options=list(ref.session_names),
+                                                    format_func=ref.session_names.get,
                                                     key="add_session")
                         
                         version = st.text_input("Version (optionnel)", key="add_version")
@@ -1878,9 +2218,9 @@ def show_memoires_management():
                    - Placez tous vos fichiers PDF dans un dossier
                    - Les noms des fichiers doivent correspondre à la colonne `nom_fichier`
                 
-                3. **Importez les données** :
-                   - Sélectionnez votre fichier Excel/CSV
-                   - Indiquez le chemin du dossier contenant les PDFs
+                3. **Importez les données**, au choix :
+                   - Compressez le fichier Excel/CSV et les PDFs dans une archive ZIP et téléversez-la
+                   - Ou sélectionnez votre fichier Excel/CSV et indiquez le chemin du dossier des PDFs sur le serveur
                    - Cliquez sur "Lancer l'import"
                 
                 ### Remarques importantes
@@ -1888,47 +2228,51 @@ def show_memoires_management():
                 - Vérifiez que les noms des filières correspondent exactement à ceux de la base
                 - Les années universitaires doivent déjà exister dans la base
                 - Les fichiers PDF doivent être nommés de manière unique
+                - Un import interrompu peut être relancé avec les mêmes fichiers : il reprend là où il s'était arrêté
+                - « Vérifier sans importer » contrôle tout le fichier (colonnes, filières, années, PDFs) sans rien copier ni enregistrer
                 """)
             
+            source = st.radio(
+                "Provenance des fichiers", [IMPORT_SOURCE_ZIP, IMPORT_SOURCE_FOLDER],
+                horizontal=True, key="import_source"
+            )
+            
             # Formulaire d'import
             with st.form("import_form"):
-                metadata_file = st.file_uploader(
-                    "Fichier Excel/CSV des métadonnées", 
-                    type=['xlsx', 'csv'],
-                    help="Fichier contenant les métadonnées des mémoires"
-                )
-                
-                pdf_folder = st.text_input(
-                    "Chemin du dossier des PDFs",
-                    help="Chemin absolu vers le dossier contenant tous les fichiers PDF"
-                )
+                archive = metadata_file = pdf_folder = None
+                if source == IMPORT_SOURCE_ZIP:
+                    archive = st.file_uploader(
+                        "Archive ZIP (fichier de métadonnées et PDFs)",
+                        type=['zip'],
+                        help="Les PDFs sont lus directement dans l'archive, sans l'extraire"
+                    )
+                else:
+                    metadata_file = st.file_uploader(
+                        "Fichier Excel/CSV des métadonnées", 
+                        type=['xlsx', 'csv'],
+                        help="Fichier contenant les métadonnées des mémoires"
+                    )
+                    
+                    pdf_folder = st.text_input(
+                        "Chemin du dossier des PDFs",
+                        help="Chemin absolu vers le dossier contenant tous les fichiers PDF"
+                    )
                 
-                submitted = st.form_submit_button("Lancer l'import")
+                col1, col2 = st.columns(2)
+                with col1:
+                    submitted = st.form_submit_button("Lancer l'import")
+                with col2:
+                    checked = st.form_submit_button("Vérifier sans importer")
                 
-                if submitted:
-                    if not metadata_file:
-                        st.error("Veuillez sélectionner un fichier de métadonnées")
-                    elif not pdf_folder:
-                        st.error("Veuillez indiquer le chemin du dossier des PDFs")
-                    elif not os.path.exists(pdf_folder):
-                        st.error("Le dossier spécifié n'existe pas")
+                if submitted or checked:
+                    metadata_file, pdf_source, error = resolve_import_files(source, archive, metadata_file, pdf_folder)
+                    if error:
+                        st.error(error)
+                    elif checked:
+                        with st.spinner("Vérification en cours..."):
+                            show_validation_report(*validate_import(metadata_file, pdf_source))
                     else:
-                        with st.spinner("Import en cours..."):
-                            success, result = bulk_import_memoires(metadata_file, pdf_folder)
-                            
-                            if success:
-                                st.success(f"""
-                                Import terminé avec succès !
-                                - Mémoires importés : {result['success_count']}
-                                - Erreurs : {result['error_count']}
-                                """)
-                                
-                                if result['errors']:
-                                    with st.expander("Voir les erreurs"):
-                                        for error in result['errors']:
-                                            st.error(error)
-                            else:
-                                st.error(f"Erreur lors de l'import : {result}")
+                        submit_import('memoires', [metadata_file], pdf_source)
         
         with tab3:
             st.subheader("Import complet (Structure + Mémoires)")
@@ -1969,17 +2313,24 @@ def show_memoires_management():
                 
                 4. **Importez les données** :
                    - Sélectionnez votre fichier Excel de structure
-                   - Sélectionnez votre fichier Excel des mémoires
-                   - Indiquez le chemin du dossier contenant les PDFs
+                   - Téléversez une archive ZIP contenant le fichier des mémoires et les PDFs,
+                     ou sélectionnez le fichier des mémoires et indiquez le chemin du dossier des PDFs sur le serveur
                    - Cliquez sur "Lancer l'import complet"
                 
                 ### Remarques importantes
                 
-                - L'import est transactionnel : en cas d'erreur, les changements sont annulés
+                - La structure est importée en une transaction ; les mémoires le sont par lots
+                - Un import interrompu peut être relancé avec les mêmes fichiers : les mémoires déjà importés sont ignorés
+                - « Vérifier sans importer » contrôle tout le fichier (colonnes, filières, années, PDFs) sans rien copier ni enregistrer
                 - Les entités, filières et sessions existantes ne seront pas dupliquées
                 - Les erreurs sont reportées de manière détaillée
                 """)
             
+            source = st.radio(
+                "Provenance des fichiers", [IMPORT_SOURCE_ZIP, IMPORT_SOURCE_FOLDER],
+                horizontal=True, key="import_complete_source"
+            )
+            
             # Formulaire d'import
             with st.form("import_complete_form"):
                 structure_file = st.file_uploader(
@@ -1988,54 +2339,42 @@ def show_memoires_management():
                     help="Fichier Excel contenant les feuilles : entites, filieres, sessions"
                 )
                 
-                metadata_file = st.file_uploader(
-                    "Fichier Excel/CSV des métadonnées des mémoires", 
-                    type=['xlsx', 'csv'],
-                    help="Fichier contenant les métadonnées des mémoires"
-                )
-                
-                pdf_folder = st.text_input(
-                    "Chemin du dossier des PDFs",
-                    help="Chemin absolu vers le dossier contenant tous les fichiers PDF"
-                )
+                archive = metadata_file = pdf_folder = None
+                if source == IMPORT_SOURCE_ZIP:
+                    archive = st.file_uploader(
+                        "Archive ZIP (fichier des mémoires et PDFs)",
+                        type=['zip'],
+                        help="Les PDFs sont lus directement dans l'archive, sans l'extraire"
+                    )
+                else:
+                    metadata_file = st.file_uploader(
+                        "Fichier Excel/CSV des métadonnées des mémoires", 
+                        type=['xlsx', 'csv'],
+                        help="Fichier contenant les métadonnées des mémoires"
+                    )
+                    
+                    pdf_folder = st.text_input(
+                        "Chemin du dossier des PDFs",
+                        help="Chemin absolu vers le dossier contenant tous les fichiers PDF"
+                    )
                 
-                submitted = st.form_submit_button("Lancer l'import complet")
+                col1, col2 = st.columns(2)
+                with col1:
+                    submitted = st.form_submit_button("Lancer l'import complet")
+                with col2:
+                    checked = st.form_submit_button("Vérifier sans importer")
                 
-                if submitted:
+                if submitted or checked:
+                    metadata_file, pdf_source, error = resolve_import_files(source, archive, metadata_file, pdf_folder)
                     if not structure_file:
                         st.error("Veuillez sélectionner le fichier de structure")
-                    elif not metadata_file:
-                        st.error("Veuillez sélectionner le fichier des métadonnées")
-                    elif not pdf_folder:
-                        st.error("Veuillez indiquer le chemin du dossier des PDFs")
-                    elif not os.path.exists(pdf_folder):
-                        st.error("Le dossier spécifié n'existe pas")
+                    elif error:
+                        st.error(error)
+                    elif checked:
+                        with st.spinner("Vérification en cours..."):
+                            show_validation_report(*validate_import(metadata_file, pdf_source, structure_file))
                     else:
-                        with st.spinner("Import complet en cours..."):
-                            success, result = bulk_import_structure_and_memoires(
-                                structure_file, metadata_file, pdf_folder
-                            )
-                            
-                            if success:
-                                st.success(f"""
-                                Import complet terminé avec succès !
-                                
-                                Structure importée :
-                                - Entités : {result['entites_count']}
-                                - Filières : {result['filieres_count']}
-                                - Sessions : {result['sessions_count']}
-                                
-                                Mémoires :
-                                - Importés : {result['memoires_success']}
-                                - Erreurs : {result['memoires_error']}
-                                """)
-                                
-                                if result['errors']:
-                                    with st.expander("Voir les erreurs"):
-                                        for error in result['errors']:
-                                            st.error(error)
-                            else:
-                                st.error(f"Erreur lors de l'import : {result}")
+                        submit_import('complet', [structure_file, metadata_file], pdf_source)
         
         with tab4:
             st.subheader("Liste des mémoires")
@@ -2043,55 +2382,76 @@ def show_memoires_management():
             # Recherche simple
             search_query = st.text_input("Rechercher un mémoire", key="manage_search")
             
-            memoires = get_all_memoires()
+            # Nouveau filtre : retour à la première page
+            if st.session_state.get('manage_filter') != search_query:
+                st.session_state.manage_filter = search_query
+                st.session_state.current_page = 1
+                st.session_state.manage_cursor = None  # ('after' | 'before', curseur)
+                st.session_state.manage_total = None
             
-            if search_query:
-                # Filtrer les mémoires par la recherche
-                memoires = memoires[
-                    memoires['titre'].str.contains(search_query, case=False) | 
-                    memoires['auteurs'].str.contains(search_query, case=False) |
-                    memoires['resume'].str.contains(search_query, case=False) |
-                    memoires['tags'].str.contains(search_query, case=False)
-                ]
+            # Mémoires ajoutés, supprimés ou importés depuis : total à recalculer
+            generation = app_cache.generation('memoires')
+            if st.session_state.get('manage_generation') != generation:
+                st.session_state.manage_generation = generation
+                st.session_state.manage_total = None
+            
+            memoires_per_page = 10
+            direction, cursor = st.session_state.manage_cursor or (None, None)
+            listing = list_memoires_page(
+                search_query or None,
+                page_size=memoires_per_page,
+                after=cursor if direction == 'after' else None,
+                before=cursor if direction == 'before' else None,
+                with_total=st.session_state.manage_total is None
+            )
+            if listing['total'] is not None:
+                st.session_state.manage_total = listing['total']
+            memoires = listing['results']
+            
+            if memoires.empty and cursor is not None:
+                # Page vidée par des suppressions : retour à la première page
+                st.session_state.current_page = 1
+                st.session_state.manage_cursor = None
+                st.rerun()
             
             if memoires.empty:
                 st.info("Aucun mémoire trouvé.")
             else:
-                st.write(f"{len(memoires)} mémoires trouvés.")
-                
-                # Afficher les mémoires avec pagination
-                memoires_per_page = 10
-                total_pages = (len(memoires) + memoires_per_page - 1) // memoires_per_page
+                st.write(f"{st.session_state.manage_total} mémoires trouvés.")
                 
-                if 'current_page' not in st.session_state:
-                    st.session_state.current_page = 1
+                total_pages = (st.session_state.manage_total + memoires_per_page - 1) // memoires_per_page
+                st.session_state.current_page = min(st.session_state.current_page, total_pages)
                 
                 # Boutons de pagination
                 col1, col2, col3 = st.columns([1, 3, 1])
                 
                 with col1:
-                    if st.button("◀️ Précédent") and st.session_state.current_page > 1:
+                    if st.button("◀️ Précédent") and listing['has_previous']:
                         st.session_state.current_page -= 1
+                        st.session_state.manage_cursor = ('before', listing['first_cursor'])
+                        st.rerun()
                 
                 with col2:
                     st.write(f"Page {st.session_state.current_page}/{total_pages}")
                 
                 with col3:
-                    if st.button("Suivant ▶️") and st.session_state.current_page < total_pages:
+                    if st.button("Suivant ▶️") and listing['has_next']:
                         st.session_state.current_page += 1
-                
-                # Calculer l'indice de début et de fin
-                start_idx = (st.session_state.current_page - 1) * memoires_per_page
-                end_idx = min(start_idx + memoires_per_page, len(memoires))
+                        st.session_state.manage_cursor = ('after', listing['last_cursor'])
+                        st.rerun()
                 
                 # Afficher les mémoires de la page courante
-                for idx in range(start_idx, end_idx):
+                # Une seule requête pour l'état d'extraction de toute la page
+                extraction_status = get_extraction_status(memoires['id'])
+                for idx in range(len(memoires)):
                     memoire = memoires.iloc[idx]
                     with st.expander(f"{memoire['titre']} - {memoire['auteurs']} ({memoire['annee_universitaire']})"):
                         st.write(f"**Encadreur:** {memoire['encadreur']}")
                         st.write(f"**Filière:** {memoire['filiere_nom']} - {memoire['entite_nom']}")
                         st.write(f"**Résumé:** {memoire['resume'][:200]}..." if len(memoire['resume']) > 200 else f"**Résumé:** {memoire['resume']}")
                         st.markdown(f"**Mots-clés:** {memoire['tags']}")
+                        statut = extraction_status.get(int(memoire['id']))
+                        st.caption(f"Texte du PDF : {EXTRACTION_LABELS.get(statut, 'non indexé')}")
                         
                         # Actions sur le mémoire
                         action_col1, action_col2, action_col3 = st.columns(3)
@@ -2099,7 +2459,10 @@ def show_memoires_management():
                         # Téléchargement
                         with action_col1:
                             if memoire['fichier_url'].startswith("local://"):
-                                st.markdown(get_download_link(memoire['fichier_url'], "📥 Télécharger le PDF"), unsafe_allow_html=True)
+                                get_download_link(
+                                    memoire['fichier_url'], "📥 Télécharger le PDF", memoire['titre'],
+                                    key=f"download_admin_{memoire['id']}"
+                                )
                         
                         # Modification
                         with action_col2:
@@ -2140,6 +2503,14 @@ def show_memoires_management():
                                     if st.button("❌ Non", key=f"confirm_no_{memoire['id']}"):
                                         del st.session_state[confirm_key]
                                         st.rerun()
+        
+        # Actualise le suivi tant qu'un import est en file ou en cours
+        own_jobs = st.session_state.get('import_job_ids', [])
+        if get_import_runner().running(own_jobs) and st.session_state.get('imports_auto_refresh', True):
+            if import_panel is None:
+                # Premier import lancé depuis cette page : le panneau n'existe pas encore
+                st.rerun()
+            watch_import_jobs(import_panel, own_jobs)
 
 def show_logs():
     st.header("📋 Journal d'activité")
@@ -2175,6 +2546,16 @@ def show_logs():
                 # Formater le dataframe pour l'affichage
                 logs_df['Utilisateur'] = logs_df['Utilisateur'].fillna('Visiteur')
                 st.dataframe(logs_df, use_container_width=True)
+            
+            # Compteurs du pool de connexions pour le dimensionnement
+            with st.expander("État du pool de connexions"):
+                st.json(db.pool_stats())
+            
+            with st.expander("Extraction du texte des PDF"):
+                st.json({
+                    'statuts': extraction_status_counts(),
+                    'pool': get_pipeline(storage.get_file).stats(),
+                })
                 
         except Exception as e:
             st.error(f"Erreur lors de la récupération des logs : {str(e)}")
@@ -2183,4 +2564,6 @@ def show_logs():
 
 # Point d'entrée principal de l'application
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Une seule connexion et une seule validation par rerun
+    with db.request_scope():
+        main()
\ No newline at end of file
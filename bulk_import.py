@@ -0,0 +1,1055 @@
+"""Import en masse des mémoires (métadonnées Excel/CSV et dossier de PDFs).
+
+Le fichier de métadonnées est lu par blocs (classeur Excel en lecture
+seule, CSV par morceaux) ; chaque bloc est validé et rapproché des filières
+et sessions par des opérations vectorisées, puis ses mémoires sont insérés
+en lot (execute_values sur PostgreSQL, executemany sur SQLite).
+
+Chaque import est suivi dans `import_jobs`, et chacune de ses lignes dans
+`import_manifest` (PDF copié, puis mémoire inséré). Les lots sont validés
+un par un : relancer un import interrompu ne recopie pas les PDFs déjà
+stockés et ne réinsère pas les mémoires déjà importés.
+
+Les PDFs proviennent d'un dossier du serveur (`PdfFolder`) ou d'une archive
+ZIP téléversée avec le fichier de métadonnées (`PdfArchive`), lue membre par
+membre sans extraction préalable.
+
+Depuis l'interface, les imports sont confiés à `ImportRunner`, qui les
+exécute dans un thread d'arrière-plan ; leur avancement (lignes traitées,
+débit, temps restant) est lu dans `import_jobs`.
+"""
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO, TextIOWrapper
+from itertools import islice
+import pandas as pd
+from openpyxl import load_workbook
+from psycopg2.extras import execute_values
+from config import APP_CONFIG
+from database import db, adapt_query
+from cache import app_cache
+from reference_data import invalidate_reference_data
+from pdf_extraction import get_pipeline, set_status, EN_ATTENTE
+from storage import FileStorage
+
+storage = FileStorage()
+
+# Colonnes obligatoires du fichier de métadonnées
+REQUIRED_COLUMNS = [
+    'titre', 'auteurs', 'encadreur', 'resume', 'filiere_nom', 'annee_universitaire', 'nom_fichier'
+]
+
+INSERT_COLUMNS = (
+    "titre, auteurs, encadreur, resume, fichier_url, tags, filiere_id, session_id, version, date_ajout"
+)
+
+# Colonnes qui identifient une ligne du fichier de métadonnées
+ROW_KEY_COLUMNS = REQUIRED_COLUMNS + ['tags', 'version']
+
+# États d'un import et des lignes de son manifeste
+JOB_EN_ATTENTE = 'en_attente'
+JOB_EN_COURS = 'en_cours'
+JOB_TERMINE = 'termine'
+JOB_ECHEC = 'echec'
+JOB_INTERROMPU = 'interrompu'
+LIGNE_COPIEE = 'copie'
+LIGNE_IMPORTEE = 'importe'
+
+
+# Feuilles du fichier de structure
+STRUCTURE_SHEETS = ['entites', 'filieres', 'sessions']
+
+
+def iter_table(uploaded_file, chunk_size=None):
+    """Lit un fichier Excel ou CSV téléversé par blocs de `chunk_size` lignes.
+
+    Le classeur Excel est ouvert en lecture seule (lignes lues au fil de
+    l'eau) ; l'index des blocs est la position de la ligne dans le fichier,
+    ce qui garde les numéros de ligne des erreurs exacts. Les lignes vides
+    sont ignorées.
+    """
+    chunk_size = chunk_size or APP_CONFIG['import_chunk_size']
+    uploaded_file.seek(0)
+    if uploaded_file.name.endswith('.csv'):
+        # Lecteur abandonné (erreur d'import) : pandas fermerait le fichier
+        # qu'on lui passe, d'où une vue distincte sur le même contenu
+        for chunk in pd.read_csv(BytesIO(uploaded_file.getvalue()), chunksize=chunk_size):
+            yield chunk
+        return
+
+    workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+        start = 0
+        while True:
+            block = [row[:len(columns)] for row in islice(rows, chunk_size)]
+            if not block:
+                break
+            chunk = pd.DataFrame(block, columns=columns, index=pd.RangeIndex(start, start + len(block)))
+            start += len(block)
+            chunk = chunk.dropna(how='all')
+            if len(chunk):
+                yield chunk
+    finally:
+        workbook.close()
+
+
+def count_rows(uploaded_file):
+    """Nombre (éventuellement approché) de lignes de données, pour l'avancement.
+
+    Lu dans les métadonnées du classeur Excel, compté sans pandas pour un
+    CSV ; None s'il est inconnu.
+    """
+    uploaded_file.seek(0)
+    if uploaded_file.name.endswith('.csv'):
+        text = TextIOWrapper(uploaded_file, encoding='utf-8', newline='')
+        try:
+            return max(sum(1 for _ in csv.reader(text)) - 1, 0)
+        finally:
+            # Ne pas fermer le fichier téléversé avec l'enveloppe texte
+            text.detach()
+    workbook = load_workbook(uploaded_file, read_only=True)
+    try:
+        max_row = workbook.worksheets[0].max_row
+        return max_row - 1 if max_row else None
+    finally:
+        workbook.close()
+
+
+def read_structure(structure_file):
+    """Lit les trois feuilles du fichier de structure en une seule ouverture."""
+    structure_file.seek(0)
+    sheets = pd.read_excel(structure_file, sheet_name=STRUCTURE_SHEETS)
+    return [sheets[name] for name in STRUCTURE_SHEETS]
+
+
+def _text(df, column):
+    # Colonne optionnelle : absente ou vide -> chaîne vide
+    if column not in df.columns:
+        return pd.Series('', index=df.index)
+    return df[column].fillna('').astype(str)
+
+
+class PdfFolder:
+    """Dossier de PDFs présent sur le serveur."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def identity(self):
+        return os.path.abspath(self.path)
+
+    def scan(self):
+        """Retourne la taille (octets) des fichiers du dossier, par nom.
+
+        Le dossier est parcouru une seule fois (voir `add_subfolder_files` pour
+        les fichiers de ses sous-dossiers).
+        """
+        sizes = {}
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    sizes[entry.name] = entry.stat().st_size
+        return sizes
+
+    def add_subfolder_files(self, sizes, df):
+        """Complète `sizes` avec les fichiers du bloc qui désignent un sous-dossier."""
+        if 'nom_fichier' not in df.columns:
+            return sizes
+        for name in set(df['nom_fichier'].dropna().astype(str)) - sizes.keys():
+            if os.path.dirname(name):
+                path = os.path.join(self.path, name)
+                if os.path.isfile(path):
+                    sizes[name] = os.path.getsize(path)
+        return sizes
+
+    def open(self, name):
+        return open(os.path.join(self.path, name), 'rb')
+
+    def close(self):
+        pass
+
+
+class PdfArchive:
+    """PDFs d'une archive ZIP, lus membre par membre depuis l'archive.
+
+    Les noms sont relatifs au dossier de l'archive qui contient le fichier
+    de métadonnées (`prefix`).
+    """
+
+    def __init__(self, archive, prefix='', spooled=None):
+        self._zip = archive if isinstance(archive, zipfile.ZipFile) else zipfile.ZipFile(archive)
+        self.prefix = prefix
+        self._spooled = spooled  # copie temporaire de l'archive (voir `open_archive`)
+
+    def identity(self):
+        # Le répertoire central suffit à identifier le contenu (noms, CRC, tailles)
+        digest = hashlib.sha256()
+        for info in self._zip.infolist():
+            digest.update(f"{info.filename}\x1f{info.CRC}\x1f{info.file_size}\n".encode())
+        return f"zip:{digest.hexdigest()}"
+
+    def scan(self):
+        """Retourne la taille décompressée des membres de l'archive, par nom."""
+        return {
+            info.filename[len(self.prefix):]: info.file_size
+            for info in self._zip.infolist()
+            if not info.is_dir() and info.filename.startswith(self.prefix)
+        }
+
+    def add_subfolder_files(self, sizes, df):
+        # Les membres des sous-dossiers sont déjà dans `scan`
+        return sizes
+
+    def open(self, name):
+        return self._zip.open(self.prefix + name)
+
+    def close(self):
+        self._zip.close()
+        if self._spooled is not None:
+            self._spooled.close()
+
+
+def open_archive(archive):
+    """Ouvre une archive ZIP d'import ; retourne (fichier de métadonnées, PdfArchive).
+
+    Le fichier de métadonnées (.xlsx ou .csv) est celui le moins profond de
+    l'archive, hors dossiers cachés ou `__MACOSX`. Lui seul est lu en
+    mémoire ; les PDFs restent dans l'archive jusqu'à leur copie.
+
+    L'archive est d'abord recopiée dans un fichier temporaire anonyme :
+    l'import, exécuté en arrière-plan, ne lit plus le fichier téléversé,
+    qui ne survit pas au rerun qui l'a reçu. Le fichier temporaire est
+    supprimé à la fermeture de l'archive.
+    """
+    spooled = tempfile.TemporaryFile()
+    try:
+        archive.seek(0)
+        shutil.copyfileobj(archive, spooled)
+        spooled.seek(0)
+        zip_file = zipfile.ZipFile(spooled)
+        candidates = [
+            info.filename for info in zip_file.infolist()
+            if not info.is_dir()
+            and info.filename.lower().endswith(('.xlsx', '.csv'))
+            and not any(part.startswith(('.', '__MACOSX')) for part in info.filename.split('/'))
+        ]
+        if not candidates:
+            raise ValueError("l'archive ne contient pas de fichier de métadonnées (.xlsx ou .csv)")
+        depth = min(name.count('/') for name in candidates)
+        candidates = [name for name in candidates if name.count('/') == depth]
+        if len(candidates) > 1:
+            raise ValueError(f"plusieurs fichiers de métadonnées dans l'archive : {', '.join(sorted(candidates))}")
+
+        name = candidates[0]
+        metadata_file = BytesIO(zip_file.read(name))
+    except Exception:
+        spooled.close()
+        raise
+    metadata_file.name = os.path.basename(name).lower()
+    prefix = name[:name.rfind('/') + 1]
+    return metadata_file, PdfArchive(zip_file, prefix, spooled)
+
+
+def as_pdf_source(pdf_source):
+    """Un chemin de dossier devient un `PdfFolder` ; les sources sont gardées telles quelles."""
+    if isinstance(pdf_source, (PdfFolder, PdfArchive)):
+        return pdf_source
+    return PdfFolder(pdf_source)
+
+
+def prepare_memoires(df, filieres_map, sessions_map, pdf_sizes=None):
+    """Valide et rapproche tout le fichier de métadonnées d'un coup.
+
+    Si `pdf_sizes` (voir `PdfFolder.scan`) est fourni, la présence des PDFs
+    est vérifiée en même temps. Retourne (lignes valides avec
+    filiere_id/session_id et, le cas échéant, la taille du PDF, erreurs).
+    L'index de `df` est la position des lignes dans le fichier : les numéros
+    de ligne des erreurs sont ceux du tableur (en-tête = ligne 1).
+    """
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes : {', '.join(missing)}")
+
+    df = df.copy()
+    df['ligne'] = df.index + 2
+    df['filiere_id'] = df['filiere_nom'].map(filieres_map)
+    df['session_id'] = df['annee_universitaire'].map(sessions_map)
+
+    incomplete = df[REQUIRED_COLUMNS].isna().any(axis=1)
+    unknown_filiere = ~incomplete & df['filiere_id'].isna()
+    unknown_session = ~incomplete & ~unknown_filiere & df['session_id'].isna()
+    invalid = incomplete | unknown_filiere | unknown_session
+    missing_file = empty_file = pd.Series(False, index=df.index)
+    if pdf_sizes is not None:
+        df['taille'] = df['nom_fichier'].astype(str).map(pdf_sizes)
+        missing_file = ~invalid & df['taille'].isna()
+        empty_file = ~invalid & (df['taille'] == 0)
+
+    messages = pd.concat([
+        pd.Series("Champs obligatoires manquants", index=df.index[incomplete]),
+        "Filière '" + df.loc[unknown_filiere, 'filiere_nom'].astype(str) + "' inconnue",
+        "Année universitaire '" + df.loc[unknown_session, 'annee_universitaire'].astype(str) + "' inconnue",
+        "Fichier PDF '" + df.loc[missing_file, 'nom_fichier'].astype(str) + "' non trouvé",
+        "Fichier PDF '" + df.loc[empty_file, 'nom_fichier'].astype(str) + "' vide",
+    ]).sort_index(kind='stable')
+    errors = [f"Ligne {index + 2}: {message}" for index, message in messages.items()]
+
+    valid = df[~(invalid | missing_file | empty_file)].copy()
+    valid['filiere_id'] = valid['filiere_id'].astype('int64')
+    valid['session_id'] = valid['session_id'].astype('int64')
+    valid['tags'] = _text(valid, 'tags')
+    valid['version'] = _text(valid, 'version')
+    return valid, errors
+
+
+def _copy_pdf(row, pdf_source):
+    # Retourne (chemin stocké, empreinte, erreur)
+    try:
+        stream = pdf_source.open(row.nom_fichier)
+    except (OSError, KeyError):
+        return None, None, f"Ligne {row.ligne}: Fichier PDF '{row.nom_fichier}' non trouvé"
+    with stream:
+        success, stored_path, sha256 = storage.save_stream(stream, f"{uuid.uuid4()}.pdf")
+    if not success:
+        return None, None, f"Ligne {row.ligne}: Erreur lors de l'enregistrement du PDF"
+    return stored_path, sha256, None
+
+
+def copy_pdfs(rows, pdf_source, workers=None):
+    """Copie les PDFs des lignes dans le stockage ; retourne (lignes copiées, erreurs).
+
+    Les copies se font par blocs, en parallèle sur un pool de threads borné
+    (la lecture, l'écriture et le calcul de l'empreinte libèrent le GIL).
+    Les lignes copiées reçoivent les colonnes `fichier_url` et `sha256`.
+    """
+    workers = workers or APP_CONFIG['import_copy_workers']
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import-copie") as executor:
+        results = list(executor.map(lambda row: _copy_pdf(row, pdf_source), rows.itertuples(index=False)))
+    
+    errors = [error for _, _, error in results if error]
+    copied = rows[[stored_path is not None for stored_path, _, _ in results]].copy()
+    copied['fichier_url'] = [stored_path for stored_path, _, _ in results if stored_path is not None]
+    copied['sha256'] = [sha256 for stored_path, sha256, _ in results if stored_path is not None]
+    return copied, errors
+
+
+def insert_memoires(cursor, rows, chunk_size=None):
+    """Insère les mémoires par lots ; retourne la liste (id, fichier_url)."""
+    db_type = db.config['db_type']
+    chunk_size = chunk_size or APP_CONFIG['import_chunk_size']
+    date_now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    values = [
+        (row.titre, row.auteurs, row.encadreur, row.resume, row.fichier_url, row.tags,
+         int(row.filiere_id), int(row.session_id), row.version, date_now)
+        for row in rows.itertuples(index=False)
+    ]
+
+    if db_type != 'sqlite':
+        ids = execute_values(
+            cursor,
+            f"INSERT INTO memoires ({INSERT_COLUMNS}) VALUES %s RETURNING id",
+            values, page_size=chunk_size, fetch=True
+        )
+        return [(row[0], value[4]) for row, value in zip(ids, values)]
+
+    insert = adapt_query(
+        f"INSERT INTO memoires ({INSERT_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)", db_type
+    )
+    imported = []
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:start + chunk_size]
+        cursor.executemany(insert, chunk)
+        # Plusieurs mémoires peuvent partager un fichier (stockage adressé par
+        # le contenu) : les ids se déduisent du dernier id attribué, la
+        # transaction d'écriture garantissant qu'ils se suivent
+        cursor.execute("SELECT MAX(id) FROM memoires")
+        last_id = cursor.fetchone()[0]
+        first_id = last_id - len(chunk) + 1
+        imported.extend((first_id + offset, value[4]) for offset, value in enumerate(chunk))
+    return imported
+
+
+def job_key(files, pdf_source):
+    """Empreinte d'un import : contenu des fichiers téléversés et source des PDFs."""
+    digest = hashlib.sha256(pdf_source.identity().encode())
+    for uploaded_file in files:
+        digest.update(uploaded_file.getvalue())
+    return digest.hexdigest()
+
+
+def row_keys(rows):
+    """Empreinte de chaque ligne, indépendante de sa position dans le fichier."""
+    values = rows.reindex(columns=ROW_KEY_COLUMNS).fillna('').astype(str)
+    joined = pd.Series(['\x1f'.join(row) for row in values.itertuples(index=False)], index=rows.index, dtype=object)
+    return joined.map(lambda value: hashlib.sha256(value.encode()).hexdigest())
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def new_job(key, kind):
+    """Enregistre un import en attente, ou réarme celui de même empreinte ; retourne son id."""
+    db_type = db.config['db_type']
+    now = _now()
+    db.connect()
+    try:
+        db.cursor.execute(adapt_query("""
+        INSERT INTO import_jobs (cle, type, statut, date_creation, date_maj) VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (cle) DO NOTHING
+        """, db_type), (key, kind, JOB_EN_ATTENTE, now, now))
+        db.cursor.execute(adapt_query("SELECT id FROM import_jobs WHERE cle = %s", db_type), (key,))
+        job_id = db.cursor.fetchone()[0]
+        db.cursor.execute(adapt_query("""
+        UPDATE import_jobs SET statut = %s, resultat = NULL, erreur = NULL, date_maj = %s WHERE id = %s
+        """, db_type), (JOB_EN_ATTENTE, now, job_id))
+        # Validé tout de suite : le thread d'import utilise sa propre connexion
+        db.conn.commit()
+        return job_id
+    finally:
+        db.close()
+
+
+def start_job(cursor, job_id, total):
+    """Démarre une exécution de l'import : remet ses compteurs à zéro."""
+    now = _now()
+    cursor.execute(adapt_query("""
+    UPDATE import_jobs SET statut = %s, nb_lignes = %s, nb_traites = 0, nb_importes = 0,
+        nb_ignores = 0, nb_erreurs = 0, date_debut = %s, date_maj = %s
+    WHERE id = %s
+    """, db.config['db_type']), (JOB_EN_COURS, total, now, now, job_id))
+
+
+def record_progress(cursor, job_id, imported, skipped, errors):
+    cursor.execute(adapt_query("""
+    UPDATE import_jobs SET nb_traites = %s, nb_importes = %s, nb_ignores = %s, nb_erreurs = %s, date_maj = %s
+    WHERE id = %s
+    """, db.config['db_type']), (imported + skipped + errors, imported, skipped, errors, _now(), job_id))
+
+
+def finish_job(job_id, statut, resultat=None, erreur=None):
+    """Enregistre l'issue d'un import (résumé JSON ou message d'erreur)."""
+    with db.connection() as conn:
+        conn.cursor().execute(adapt_query("""
+        UPDATE import_jobs SET statut = %s, resultat = %s, erreur = %s, date_maj = %s WHERE id = %s
+        """, db.config['db_type']), (
+            statut, json.dumps(resultat, ensure_ascii=False) if resultat is not None else None,
+            erreur, _now(), job_id
+        ))
+
+
+def load_manifest(job_id, keys):
+    """Retourne les lignes `keys` du manifeste d'un import, indexées par clé."""
+    keys = list(keys)
+    placeholders = ", ".join(["%s"] * len(keys)) or "NULL"
+    return pd.read_sql_query(adapt_query(f"""
+    SELECT cle_ligne, sha256, fichier_url, statut FROM import_manifest
+    WHERE job_id = %s AND cle_ligne IN ({placeholders})
+    """, db.config['db_type']), db.conn, params=(job_id, *keys)).set_index('cle_ligne')
+
+
+def imported_keys(keys):
+    """Clés de ligne déjà importées par un import quelconque, dont le mémoire existe encore."""
+    keys = list(keys)
+    placeholders = ", ".join(["%s"] * len(keys)) or "NULL"
+    db.cursor.execute(adapt_query(f"""
+    SELECT DISTINCT im.cle_ligne FROM import_manifest im
+    JOIN memoires m ON m.id = im.memoire_id
+    WHERE im.statut = %s AND im.cle_ligne IN ({placeholders})
+    """, db.config['db_type']), (LIGNE_IMPORTEE, *keys))
+    return {row[0] for row in db.cursor.fetchall()}
+
+
+def find_existing(rows):
+    """Id du mémoire déjà présent pour chaque ligne copiée (NaN sinon).
+
+    Un mémoire est considéré comme déjà importé s'il a le même titre, les
+    mêmes auteurs, la même session et le même PDF (même fichier stocké, ou
+    même empreinte inscrite au manifeste d'un import précédent) : une ligne
+    corrigée ou un même lot fourni en CSV plutôt qu'en Excel n'est donc pas
+    inséré une seconde fois.
+    """
+    urls, digests = list(rows['fichier_url']), list(rows['sha256'])
+    url_placeholders = ", ".join(["%s"] * len(urls)) or "NULL"
+    sha_placeholders = ", ".join(["%s"] * len(digests)) or "NULL"
+    db.cursor.execute(adapt_query(f"""
+    SELECT m.id, m.titre, m.auteurs, m.session_id, m.fichier_url, im.sha256
+    FROM memoires m
+    LEFT JOIN import_manifest im ON im.memoire_id = m.id AND im.statut = %s
+    WHERE m.fichier_url IN ({url_placeholders}) OR im.sha256 IN ({sha_placeholders})
+    """, db.config['db_type']), (LIGNE_IMPORTEE, *urls, *digests))
+    existing = {}
+    for memoire_id, titre, auteurs, session_id, fichier_url, sha256 in db.cursor.fetchall():
+        existing[(titre, auteurs, session_id, fichier_url)] = memoire_id
+        if sha256:
+            existing[(titre, auteurs, session_id, sha256)] = memoire_id
+    return pd.Series([
+        existing.get((row.titre, row.auteurs, row.session_id, row.fichier_url),
+                     existing.get((row.titre, row.auteurs, row.session_id, row.sha256)))
+        for row in rows.itertuples(index=False)
+    ], index=rows.index, dtype=object)
+
+
+def _store_chunk(cursor, job_id, chunk, manifest, pdf_source):
+    # Réutilise les PDFs déjà copiés par une exécution précédente, copie les
+    # autres et les inscrit au manifeste avant d'insérer les mémoires.
+    copied = manifest[manifest['statut'] == LIGNE_COPIEE]
+    reuse = chunk['cle'].isin(copied.index)
+    reuse &= chunk['cle'].map(copied['fichier_url']).map(
+        lambda url: isinstance(url, str) and storage.get_download_url(url) is not None
+    )
+    reused = chunk[reuse].copy()
+    reused['fichier_url'] = reused['cle'].map(copied['fichier_url'])
+    reused['sha256'] = reused['cle'].map(copied['sha256'])
+
+    fresh, errors = copy_pdfs(chunk[~reuse], pdf_source)
+    _record_copies(cursor, job_id, fresh)
+    stored = pd.concat([reused, fresh])
+
+    # Inscrits au manifeste, les fichiers sont protégés du nettoyage des
+    # fichiers sans référence ; un fichier partagé supprimé avant cette
+    # inscription (entre sa réutilisation et maintenant) est recopié
+    missing = stored['fichier_url'].map(lambda url: storage.get_download_url(url) is None)
+    if missing.any():
+        recopied, recopy_errors = copy_pdfs(stored[missing].drop(columns=['fichier_url', 'sha256']), pdf_source)
+        _record_copies(cursor, job_id, recopied)
+        errors += recopy_errors
+        stored = pd.concat([stored[~missing], recopied])
+    return stored, errors
+
+
+def _record_copies(cursor, job_id, rows):
+    # Inscrit les PDFs copiés au manifeste et valide aussitôt
+    if len(rows):
+        cursor.executemany(adapt_query("""
+        INSERT INTO import_manifest (job_id, cle_ligne, sha256, fichier_url, statut)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (job_id, cle_ligne) DO UPDATE SET
+            sha256 = excluded.sha256, fichier_url = excluded.fichier_url, statut = excluded.statut
+        """, db.config['db_type']), [
+            (job_id, cle, sha256, fichier_url, LIGNE_COPIEE)
+            for cle, sha256, fichier_url in zip(rows['cle'], rows['sha256'], rows['fichier_url'])
+        ])
+    db.conn.commit()
+
+
+def import_memoires(cursor, chunks, pdf_source, filieres_map, sessions_map, job_id, total=None):
+    """Valide, copie et insère les mémoires d'un fichier de métadonnées.
+
+    `chunks` produit le fichier par blocs (voir `iter_table`) : chaque bloc
+    est validé, copié puis inséré et enregistré avec l'avancement de
+    l'import, si bien que la mémoire utilisée ne dépend pas de la taille du
+    fichier. Les lignes en double, déjà importées (par cet import ou un
+    autre) ou correspondant à un mémoire existant (voir find_existing) sont
+    ignorées. Les mémoires insérés sont confiés à
+    l'extraction du texte. Retourne (liste (id, fichier_url) importés,
+    nombre de lignes ignorées, erreurs).
+    """
+    db_type = db.config['db_type']
+    start_job(cursor, job_id, total)
+    db.conn.commit()
+    pdf_sizes = pdf_source.scan()
+
+    imported, skipped, errors = [], 0, []
+    # Empreintes (32 octets) des lignes déjà vues, pour écarter les doublons entre blocs
+    seen = set()
+    for df in chunks:
+        rows, chunk_errors = prepare_memoires(
+            df, filieres_map, sessions_map, pdf_source.add_subfolder_files(pdf_sizes, df)
+        )
+        errors += chunk_errors
+        rows['cle'] = row_keys(rows)
+        digests = rows['cle'].map(bytes.fromhex)
+        duplicate = rows['cle'].duplicated() | digests.map(seen.__contains__).astype(bool)
+        seen.update(digests)
+        manifest = load_manifest(job_id, rows['cle'])
+        # Lignes déjà importées, par cet import ou par un autre
+        done = duplicate | rows['cle'].isin(imported_keys(rows['cle']))
+        skipped += int(done.sum())
+        rows = rows[~done]
+        if rows.empty:
+            record_progress(cursor, job_id, len(imported), skipped, len(errors))
+            db.conn.commit()
+            continue
+
+        chunk, copy_errors = _store_chunk(cursor, job_id, rows, manifest, pdf_source)
+        errors += copy_errors
+        existing = find_existing(chunk)
+        if existing.notna().any():
+            skipped += _link_existing(cursor, job_id, chunk[existing.notna()], existing.dropna())
+            chunk = chunk[existing.isna()]
+        try:
+            chunk_ids = insert_memoires(cursor, chunk, len(chunk) or None)
+            cursor.executemany(adapt_query("""
+            UPDATE import_manifest SET statut = %s, memoire_id = %s
+            WHERE job_id = %s AND cle_ligne = %s
+            """, db_type), [
+                (LIGNE_IMPORTEE, memoire_id, job_id, cle)
+                for cle, (memoire_id, _) in zip(chunk['cle'], chunk_ids)
+            ])
+            set_status(cursor, db_type, [memoire_id for memoire_id, _ in chunk_ids], EN_ATTENTE)
+            record_progress(cursor, job_id, len(imported) + len(chunk_ids), skipped, len(errors))
+            db.conn.commit()
+        except Exception:
+            # Les PDFs restent inscrits au manifeste et seront réutilisés
+            db.conn.rollback()
+            raise
+        imported += chunk_ids
+        app_cache.invalidate('memoires')
+        get_pipeline(storage.get_file).submit(chunk_ids)
+    return imported, skipped, errors
+
+
+def _link_existing(cursor, job_id, rows, memoire_ids):
+    # Rattache au manifeste les lignes dont le mémoire existe déjà ; une copie
+    # qui n'est pas le fichier du mémoire est inscrite sans référence, pour
+    # être supprimée par le nettoyage des fichiers (purge_released_files)
+    db_type = db.config['db_type']
+    placeholders = ", ".join(["%s"] * len(memoire_ids))
+    cursor.execute(adapt_query(
+        f"SELECT id, fichier_url FROM memoires WHERE id IN ({placeholders})", db_type
+    ), [int(memoire_id) for memoire_id in memoire_ids])
+    urls = {row[0]: row[1] for row in cursor.fetchall()}
+    cursor.executemany(adapt_query("""
+    UPDATE import_manifest SET statut = %s, memoire_id = %s, fichier_url = %s
+    WHERE job_id = %s AND cle_ligne = %s
+    """, db_type), [
+        (LIGNE_IMPORTEE, int(memoire_id), urls[memoire_id], job_id, cle)
+        for cle, memoire_id in zip(rows['cle'], memoire_ids)
+    ])
+    cursor.executemany(adapt_query("""
+    INSERT INTO fichiers (fichier_url, nb_references) VALUES (%s, 0)
+    ON CONFLICT (fichier_url) DO NOTHING
+    """, db_type), [
+        (url,) for url, memoire_id in zip(rows['fichier_url'], memoire_ids) if url != urls[memoire_id]
+    ])
+    db.conn.commit()
+    return len(rows)
+
+
+def _load_map(query, key):
+    df = pd.read_sql_query(adapt_query(query, db.config['db_type']), db.conn)
+    return dict(zip(df[key], df['id']))
+
+
+def validate_import(metadata_file, pdf_source, structure_file=None, chunk_size=None):
+    """Vérifie un import sans rien copier ni écrire (import à blanc).
+
+    Le fichier est lu par blocs. Les filières et années universitaires sont
+    rapprochées de celles de la base et, pour un import complet, de celles
+    du fichier de structure ; le dossier (ou l'archive) des PDFs est
+    parcouru une seule fois. Retourne (True, rapport) ou (False, message).
+    """
+    try:
+        pdf_source = as_pdf_source(pdf_source)
+        filieres, sessions = {}, {}
+        if structure_file is not None:
+            # Les noms déclarés dans la structure seront créés par l'import
+            _, filieres_df, sessions_df = read_structure(structure_file)
+            filieres = dict.fromkeys(_names(filieres_df, 'nom', '')[0], 0)
+            sessions = dict.fromkeys(_names(sessions_df, 'annee_universitaire', '')[0], 0)
+        pdf_sizes = pdf_source.scan()
+        report = {'total': 0, 'valid_count': 0, 'skipped_count': 0, 'bytes_to_copy': 0}
+        errors = []
+        seen = set()
+
+        db.connect()
+        try:
+            filieres.update(_load_map('SELECT id, nom FROM filieres', 'nom'))
+            sessions.update(_load_map('SELECT id, annee_universitaire FROM sessions', 'annee_universitaire'))
+            for df in iter_table(metadata_file, chunk_size):
+                rows, chunk_errors = prepare_memoires(
+                    df, filieres, sessions, pdf_source.add_subfolder_files(pdf_sizes, df)
+                )
+                errors += chunk_errors
+                keys = row_keys(rows)
+                digests = keys.map(bytes.fromhex)
+                done = keys.duplicated() | digests.map(seen.__contains__).astype(bool)
+                seen.update(digests)
+                done |= keys.isin(imported_keys(keys))
+                report['total'] += len(df)
+                report['valid_count'] += len(rows)
+                report['skipped_count'] += int(done.sum())
+                report['bytes_to_copy'] += int(rows.loc[~done, 'taille'].sum())
+        finally:
+            db.close()
+
+        report['error_count'] = len(errors)
+        report['errors'] = errors
+        return True, report
+    except Exception as e:
+        return False, str(e)
+
+
+def bulk_import_memoires(metadata_file, pdf_source, chunk_size=None, job_id=None):
+    """
+    Importe en masse des mémoires à partir d'un fichier Excel/CSV et de PDFs
+    (chemin d'un dossier du serveur, `PdfFolder` ou `PdfArchive`).
+    
+    Le fichier Excel/CSV doit contenir les colonnes suivantes:
+    - titre
+    - auteurs
+    - encadreur
+    - resume
+    - tags
+    - filiere_nom (nom exact de la filière)
+    - annee_universitaire (doit exister dans la base)
+    - version (optionnel)
+    - nom_fichier (nom du fichier PDF dans le dossier)
+    """
+    try:
+        pdf_source = as_pdf_source(pdf_source)
+        if job_id is None:
+            job_id = new_job(job_key([metadata_file], pdf_source), 'memoires')
+        
+        db.connect()
+        try:
+            filieres_map = _load_map('SELECT id, nom FROM filieres', 'nom')
+            sessions_map = _load_map('SELECT id, annee_universitaire FROM sessions', 'annee_universitaire')
+            imported, skipped, errors = import_memoires(
+                db.cursor, iter_table(metadata_file, chunk_size), pdf_source, filieres_map, sessions_map,
+                job_id, count_rows(metadata_file)
+            )
+        except Exception:
+            db.conn.rollback()
+            raise
+        finally:
+            db.close()
+        
+        result = {
+            'success_count': len(imported),
+            'skipped_count': skipped,
+            'error_count': len(errors),
+            'errors': errors
+        }
+        finish_job(job_id, JOB_TERMINE, resultat=result)
+        return True, result
+    except Exception as e:
+        if job_id is not None:
+            finish_job(job_id, JOB_ECHEC, erreur=str(e))
+        return False, str(e)
+
+
+def _insert_batch(cursor, table, columns, rows, conflict):
+    # Retourne le nombre de lignes réellement créées
+    if db.config['db_type'] == 'sqlite':
+        placeholders = ", ".join(["?"] * len(columns))
+        cursor.executemany(f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+        return cursor.rowcount
+    created = execute_values(
+        cursor,
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s ON CONFLICT ({conflict}) DO NOTHING RETURNING id",
+        rows, fetch=True
+    )
+    return len(created)
+
+
+def insert_missing(cursor, table, columns, rows, conflict):
+    """Insère en un lot les lignes absentes de `table` ; retourne (créées, erreurs).
+
+    Le lot est protégé par un point de sauvegarde : s'il échoue, les lignes
+    sont rejouées une à une, chacune dans son propre point de sauvegarde,
+    afin d'isoler les fautives sans invalider la transaction d'import.
+    """
+    if not rows:
+        return 0, []
+    cursor.execute("SAVEPOINT import_lot")
+    try:
+        created = _insert_batch(cursor, table, columns, rows, conflict)
+        cursor.execute("RELEASE SAVEPOINT import_lot")
+        return created, []
+    except Exception:
+        cursor.execute("ROLLBACK TO SAVEPOINT import_lot")
+        cursor.execute("RELEASE SAVEPOINT import_lot")
+
+    created = 0
+    errors = []
+    for row in rows:
+        cursor.execute("SAVEPOINT import_ligne")
+        try:
+            created += _insert_batch(cursor, table, columns, [row], conflict)
+            cursor.execute("RELEASE SAVEPOINT import_ligne")
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT import_ligne")
+            cursor.execute("RELEASE SAVEPOINT import_ligne")
+            errors.append(f"{table} {row}: {e}")
+    return created, errors
+
+
+def _names(df, column, label):
+    # Valeurs distinctes d'une colonne obligatoire, et erreurs des lignes vides
+    missing = df.index[df[column].isna()]
+    errors = [f"{label}, ligne {index + 2}: '{column}' manquant" for index in missing]
+    values = df[column].dropna().astype(str).str.strip()
+    return list(dict.fromkeys(values[values != ''])), errors
+
+
+def import_structure(cursor, entites_df, filieres_df, sessions_df):
+    """Crée les entités, filières et sessions manquantes.
+
+    Quelques requêtes par table, quel que soit le volume : un INSERT groupé
+    qui ignore les doublons, puis une lecture des identifiants. Retourne
+    (entites_map, filieres_map, sessions_map, créations par table, erreurs).
+    Rien n'est validé ici : l'appelant valide ou annule toute la structure.
+    """
+    if db.config['db_type'] == 'sqlite' and not db.conn.in_transaction:
+        # Hors transaction explicite, chaque RELEASE SAVEPOINT de SQLite
+        # validerait son lot : une erreur ultérieure ne pourrait plus l'annuler
+        cursor.execute("BEGIN")
+    errors = []
+    created = {}
+    
+    # 1. Entités
+    entites, missing = _names(entites_df, 'nom', "Entités")
+    errors += missing
+    created['entites'], failed = insert_missing(cursor, 'entites', ['nom'], [(nom,) for nom in entites], 'nom')
+    errors += failed
+    wanted = set(entites)
+    entites_map = {
+        nom: entite_id for nom, entite_id in _load_map('SELECT id, nom FROM entites', 'nom').items()
+        if nom in wanted
+    }
+    
+    # 2. Filières (rattachées à une entité du fichier)
+    filieres = filieres_df.dropna(subset=['nom', 'entite_nom']).copy()
+    errors += [
+        f"Filières, ligne {index + 2}: 'nom' ou 'entite_nom' manquant"
+        for index in filieres_df.index.difference(filieres.index)
+    ]
+    filieres['nom'] = filieres['nom'].astype(str).str.strip()
+    filieres['entite_id'] = filieres['entite_nom'].astype(str).str.strip().map(entites_map)
+    orphans = filieres['entite_id'].isna()
+    errors += [
+        f"Filières, ligne {index + 2}: entité '{entite}' inconnue"
+        for index, entite in filieres.loc[orphans, 'entite_nom'].items()
+    ]
+    filieres = filieres[~orphans].drop_duplicates(['nom', 'entite_id'])
+    pairs = [(nom, int(entite_id)) for nom, entite_id in zip(filieres['nom'], filieres['entite_id'])]
+    created['filieres'], failed = insert_missing(cursor, 'filieres', ['nom', 'entite_id'], pairs, 'nom, entite_id')
+    errors += failed
+    existing = pd.read_sql_query("SELECT id, nom, entite_id FROM filieres", db.conn)
+    wanted = set(pairs)
+    filieres_map = {
+        nom: filiere_id for filiere_id, nom, entite_id
+        in zip(existing['id'], existing['nom'], existing['entite_id'])
+        if (nom, int(entite_id)) in wanted
+    }
+    
+    # 3. Sessions
+    sessions, missing = _names(sessions_df, 'annee_universitaire', "Sessions")
+    errors += missing
+    created['sessions'], failed = insert_missing(
+        cursor, 'sessions', ['annee_universitaire'], [(annee,) for annee in sessions], 'annee_universitaire'
+    )
+    errors += failed
+    wanted = set(sessions)
+    sessions_map = {
+        annee: session_id for annee, session_id
+        in _load_map('SELECT id, annee_universitaire FROM sessions', 'annee_universitaire').items()
+        if annee in wanted
+    }
+    return entites_map, filieres_map, sessions_map, created, errors
+
+
+def bulk_import_structure_and_memoires(structure_file, metadata_file, pdf_source, chunk_size=None, job_id=None):
+    """
+    Importe la structure complète (entités, filières, sessions) et les mémoires.
+    
+    Le fichier structure_file (Excel) doit contenir 3 feuilles :
+    - entites: nom
+    - filieres: nom, entite_nom
+    - sessions: annee_universitaire
+    """
+    try:
+        pdf_source = as_pdf_source(pdf_source)
+        if job_id is None:
+            job_id = new_job(job_key([structure_file, metadata_file], pdf_source), 'complet')
+        db.connect()
+        c = db.cursor
+        # 1 à 3. Import de la structure
+        entites_map, filieres_map, sessions_map, created, errors = import_structure(
+            c, *read_structure(structure_file)
+        )
+        
+        # 4. Import des mémoires, lus par blocs
+        # La structure est validée avant l'import des mémoires, qui se fait par lots
+        db.conn.commit()
+        invalidate_reference_data()
+        imported, skipped, memoire_errors = import_memoires(
+            c, iter_table(metadata_file, chunk_size), pdf_source, filieres_map, sessions_map,
+            job_id, count_rows(metadata_file)
+        )
+        errors += memoire_errors
+        db.close()
+        
+        result = {
+            'entites_count': len(entites_map),
+            'filieres_count': len(filieres_map),
+            'sessions_count': len(sessions_map),
+            'created': created,
+            'memoires_success': len(imported),
+            'memoires_skipped': skipped,
+            'memoires_error': len(memoire_errors),
+            'errors': errors
+        }
+        finish_job(job_id, JOB_TERMINE, resultat=result)
+        return True, result
+        
+    except Exception as e:
+        if db.conn is not None:
+            db.conn.rollback()
+        db.close()
+        if job_id is not None:
+            finish_job(job_id, JOB_ECHEC, erreur=str(e))
+        return False, str(e)
+
+
+def _detach(uploaded_file):
+    # Copie du fichier téléversé : il doit survivre au rerun qui l'a reçu
+    data = BytesIO(uploaded_file.getvalue())
+    data.name = uploaded_file.name
+    return data
+
+
+class ImportRunner:
+    """Exécute les imports en masse un par un, dans un thread d'arrière-plan."""
+
+    def __init__(self):
+        # Un seul import à la fois : ils se disputeraient les écritures
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="import")
+        self._lock = threading.Lock()
+        self._active = {}  # empreinte -> id de l'import
+
+    def submit(self, kind, files, pdf_source, chunk_size=None):
+        """Met un import en file ('memoires' ou 'complet').
+
+        Retourne (True, id de l'import) ou (False, message) si le même import
+        est déjà en file ou en cours.
+        """
+        files = [_detach(uploaded_file) for uploaded_file in files]
+        pdf_source = as_pdf_source(pdf_source)
+        key = job_key(files, pdf_source)
+        with self._lock:
+            if key in self._active:
+                return False, "Cet import est déjà en file d'attente ou en cours"
+            self._active[key] = None
+        try:
+            job_id = new_job(key, kind)
+            with self._lock:
+                self._active[key] = job_id
+            self._executor.submit(self._run, key, kind, files, pdf_source, chunk_size, job_id)
+        except Exception:
+            with self._lock:
+                self._active.pop(key, None)
+            raise
+        return True, job_id
+
+    def active(self):
+        """Nombre d'imports en file ou en cours dans ce processus."""
+        with self._lock:
+            return len(self._active)
+
+    def running(self, job_ids):
+        """Indique si l'un des imports `job_ids` est en file ou en cours."""
+        with self._lock:
+            return not set(job_ids).isdisjoint(self._active.values())
+
+    def interrupt_stale(self):
+        """Marque comme interrompus les imports d'un processus précédent."""
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(adapt_query("""
+            UPDATE import_jobs SET statut = %s, erreur = %s, date_maj = %s WHERE statut IN (%s, %s)
+            """, db.config['db_type']), (
+                JOB_INTERROMPU, "Serveur redémarré : relancez l'import avec les mêmes fichiers pour le reprendre",
+                _now(), JOB_EN_ATTENTE, JOB_EN_COURS
+            ))
+            return cursor.rowcount
+
+    def _run(self, key, kind, files, pdf_source, chunk_size, job_id):
+        try:
+            if kind == 'complet':
+                success, result = bulk_import_structure_and_memoires(
+                    *files, pdf_source, chunk_size=chunk_size, job_id=job_id
+                )
+            else:
+                success, result = bulk_import_memoires(*files, pdf_source, chunk_size=chunk_size, job_id=job_id)
+            if not success:
+                print(f"Erreur lors de l'import {job_id}: {result}")
+        finally:
+            pdf_source.close()
+            with self._lock:
+                self._active.pop(key, None)
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_import_runner():
+    """Retourne l'exécuteur d'imports du processus, créé au premier appel.
+
+    À sa création, les imports laissés en cours par un arrêt du serveur sont
+    marqués interrompus : ils reprennent quand on les relance.
+    """
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = ImportRunner()
+            _runner.interrupt_stale()
+        return _runner
+
+
+def list_jobs(limit=10):
+    """Retourne les derniers imports, du plus récent au plus ancien."""
+    db.connect()
+    try:
+        return pd.read_sql_query(adapt_query("""
+        SELECT id, type, statut, nb_lignes, nb_traites, nb_importes, nb_ignores, nb_erreurs,
+               date_creation, date_debut, date_maj, resultat, erreur
+        FROM import_jobs
+        ORDER BY date_creation DESC, id DESC
+        LIMIT %s
+        """, db.config['db_type']), db.conn, params=(limit,))
+    finally:
+        db.close()
+
+
+def job_progress(job, now=None):
+    """Avancement d'un import : (fraction, lignes par seconde, secondes restantes).
+
+    Le débit ne compte que les lignes traitées par l'exécution en cours (les
+    lignes déjà importées sont ignorées sans coût) ; il vaut None tant
+    qu'aucun lot n'est terminé, de même que le temps restant.
+    """
+    total = job['nb_lignes']
+    if pd.isna(total) or not total:
+        return (1.0 if job['statut'] == JOB_TERMINE else 0.0), None, None
+    # Les lignes vides du fichier ne sont pas comptées : un import terminé est complet
+    fraction = 1.0 if job['statut'] == JOB_TERMINE else min(job['nb_traites'] / total, 1.0)
+    if pd.isna(job['date_debut']):
+        return fraction, None, None
+    end = now or datetime.now()
+    if job['statut'] != JOB_EN_COURS:
+        end = pd.Timestamp(job['date_maj']).to_pydatetime()
+    elapsed = (end - pd.Timestamp(job['date_debut']).to_pydatetime()).total_seconds()
+    processed = job['nb_traites'] - job['nb_ignores']
+    if elapsed <= 0 or processed <= 0:
+        return fraction, None, None
+    rate = processed / elapsed
+    remaining = (total - job['nb_traites']) / rate if job['statut'] == JOB_EN_COURS else 0
+    return fraction, rate, remaining
@@ -0,0 +1,69 @@
+import threading
+import time
+
+
+class SharedCache:
+    """Cache mémoire partagé par toutes les sessions du processus.
+
+    Chaque entrée est rattachée à des étiquettes (par exemple 'memoires') ;
+    `invalidate` supprime toutes les entrées d'une étiquette après une
+    écriture. Un compteur de génération par étiquette empêche qu'un
+    chargement commencé avant l'invalidation ne réinsère une valeur périmée.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # clé -> (valeur, étiquettes, expiration)
+        self._generations = {}  # étiquette -> compteur d'invalidations
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key, loader, tags=(), ttl=None):
+        """Retourne la valeur en cache ou la calcule avec `loader()`."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[2] is None or entry[2] > now):
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generations = {tag: self._generations.setdefault(tag, 0) for tag in tags}
+
+        value = loader()
+
+        with self._lock:
+            # Ne pas mettre en cache un résultat invalidé pendant son calcul
+            if all(self._generations.get(tag, 0) == gen for tag, gen in generations.items()):
+                expires = now + ttl if ttl else None
+                self._entries[key] = (value, tuple(tags), expires)
+        return value
+
+    def generation(self, tag):
+        """Compteur d'invalidations d'une étiquette (change à chaque écriture)."""
+        with self._lock:
+            return self._generations.get(tag, 0)
+
+    def invalidate(self, *tags):
+        """Supprime les entrées portant l'une des étiquettes données."""
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            self._entries = {
+                key: entry for key, entry in self._entries.items()
+                if not set(entry[1]) & set(tags)
+            }
+
+    def clear(self):
+        """Vide entièrement le cache."""
+        with self._lock:
+            for tag in self._generations:
+                self._generations[tag] += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+# Instance unique, partagée par toutes les sessions Streamlit du processus
+app_cache = SharedCache()
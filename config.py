@@ -11,13 +11,24 @@ def get_db_config():
             'port': st.secrets["db_port"],
             'database': st.secrets["db_name"],
             'user': st.secrets["db_user"],
-            'password': st.secrets["db_password"]
+            'password': st.secrets["db_password"],
+            # Dimensionnement du pool de connexions
+            'pool_min_size': int(st.secrets.get("db_pool_min_size", 1)),
+            'pool_max_size': int(st.secrets.get("db_pool_max_size", 10)),
+            'pool_timeout': float(st.secrets.get("db_pool_timeout", 30)),
+            'pool_max_idle': float(st.secrets.get("db_pool_max_idle", 300)),
+            'pool_max_lifetime': float(st.secrets.get("db_pool_max_lifetime", 3600))
         }
     else:
         # Configuration SQLite pour le développement local
         return {
             'db_type': 'sqlite',
-            'db_path': 'data/memoires_db.sqlite'
+            'db_path': 'data/memoires_db.sqlite',
+            # Réglages du moteur SQLite (mode WAL, une connexion par thread)
+            'sqlite_busy_timeout': int(st.secrets.get("sqlite_busy_timeout", 5000)),
+            'sqlite_cache_size_kb': int(st.secrets.get("sqlite_cache_size_kb", 20000)),
+            'sqlite_mmap_size': int(st.secrets.get("sqlite_mmap_size", 256 * 1024 * 1024)),
+            'sqlite_checkpoint_interval': float(st.secrets.get("sqlite_checkpoint_interval", 60))
         }
 
 # Configuration de l'application
@@ -28,7 +39,10 @@ APP_CONFIG = {
     'admin_password': 'admin123',
     'max_file_size': 10 * 1024 * 1024,  # 10MB
     'allowed_extensions': ['.pdf'],
-    'upload_folder': 'uploads'
+    'upload_folder': 'uploads',
+    'import_chunk_size': 500,  # mémoires insérés par requête lors des imports en masse
+    'import_copy_workers': 4,  # copies de PDF simultanées lors des imports en masse
+    'storage_content_addressed': True  # PDF stockés sous leur empreinte SHA-256, sans doublons
 }
 
 # Créer le dossier de données si nécessaire
@@ -0,0 +1,240 @@
+import threading
+import time
+from collections import deque
+
+
+class PoolError(Exception):
+    """Erreur générique du pool de connexions."""
+
+
+class PoolTimeout(PoolError):
+    """Aucune connexion n'a pu être obtenue dans le délai imparti."""
+
+
+class _Waiter:
+    """Appelant en attente : reçoit une connexion ou le droit d'en ouvrir une."""
+
+    def __init__(self, lock):
+        self.cond = threading.Condition(lock)
+        self.conn = None
+        self.create = False
+
+
+class ConnectionPool:
+    """Pool de connexions borné et thread-safe.
+
+    Les connexions sont créées à la demande jusqu'à `max_size`, vérifiées
+    avant d'être remises à l'appelant et recyclées lorsqu'elles sont restées
+    inactives trop longtemps (au-delà de `min_size`) ou ont dépassé leur
+    durée de vie maximale. Les appelants en attente sont servis dans l'ordre
+    d'arrivée : une connexion rendue (ou une place libérée) est remise
+    directement au plus ancien d'entre eux.
+    """
+
+    def __init__(self, factory, min_size=1, max_size=10, timeout=30.0,
+                 max_idle=300.0, max_lifetime=3600.0, check=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Tailles de pool invalides")
+        self._factory = factory
+        self._check = check
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+
+        self._lock = threading.Lock()
+        self._idle = deque()  # (connexion, date de création, dernière utilisation)
+        self._waiters = deque()  # appelants en attente, du plus ancien au plus récent
+        self._created = {}  # id(connexion) -> date de création
+        self._size = 0
+        self._closed = False
+
+        # Compteurs exposés par stats()
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._opened = 0
+        self._discarded = 0
+        self._failed_checks = 0
+
+    def getconn(self):
+        """Emprunte une connexion, en attendant au plus `timeout` secondes."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        while True:
+            conn = None
+            idle_for = 0.0
+            create = False
+            stale = []
+            with self._lock:
+                if self._closed:
+                    raise PoolError("Le pool de connexions est fermé")
+                # Personne ne double les appelants déjà en attente
+                if not self._waiters:
+                    conn, idle_for, create = self._take(time.monotonic(), stale)
+                if conn is None and not create:
+                    waited = True
+                    conn, create = self._wait(deadline)
+            self._close_all(stale)
+
+            if create:
+                try:
+                    conn = self._factory()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._grant()
+                    raise
+                with self._lock:
+                    self._created[id(conn)] = time.monotonic()
+                    self._opened += 1
+            elif self._check is not None and not self._healthy(conn, idle_for):
+                with self._lock:
+                    self._failed_checks += 1
+                self._drop(conn)
+                continue
+
+            waited_for = time.monotonic() - start
+            with self._lock:
+                self._checkouts += 1
+                if waited:
+                    self._waits += 1
+                    self._wait_total += waited_for
+                    self._wait_max = max(self._wait_max, waited_for)
+            return conn
+
+    def putconn(self, conn, discard=False):
+        """Rend une connexion au pool (ou la ferme si `discard`)."""
+        now = time.monotonic()
+        with self._lock:
+            created = self._created.get(id(conn), now)
+            close = self._closed or discard or now - created > self.max_lifetime
+            if close:
+                self._forget(conn)
+            elif self._waiters:
+                # Remise directe au plus ancien appelant en attente
+                waiter = self._waiters.popleft()
+                waiter.conn = conn
+                waiter.cond.notify()
+            else:
+                self._idle.append((conn, created, now))
+        if close:
+            self._close_all([conn])
+
+    def stats(self):
+        """Retourne un instantané des compteurs du pool."""
+        with self._lock:
+            idle = len(self._idle)
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': idle,
+                'in_use': self._size - idle,
+                'waiting': len(self._waiters),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time_total': round(self._wait_total, 6),
+                'wait_time_max': round(self._wait_max, 6),
+                'wait_time_avg': round(self._wait_total / self._waits, 6) if self._waits else 0.0,
+                'timeouts': self._timeouts,
+                'connections_opened': self._opened,
+                'connections_closed': self._discarded,
+                'failed_checks': self._failed_checks,
+            }
+
+    def closeall(self):
+        """Ferme toutes les connexions inactives et refuse les emprunts suivants."""
+        with self._lock:
+            self._closed = True
+            conns = [conn for conn, _, _ in self._idle]
+            self._idle.clear()
+            for conn in conns:
+                self._forget(conn)
+            for waiter in self._waiters:
+                waiter.cond.notify()
+        self._close_all(conns)
+
+    def _take(self, now, stale):
+        # À appeler sous verrou : retourne (connexion, inactivité, création)
+        while self._idle:
+            candidate, created, last_used = self._idle.pop()
+            if self._expired(created, last_used, now, len(stale)):
+                stale.append(candidate)
+                continue
+            return candidate, now - last_used, False
+        for conn in stale:
+            self._forget(conn)
+        if self._size < self.max_size:
+            self._size += 1
+            return None, 0.0, True
+        return None, 0.0, False
+
+    def _wait(self, deadline):
+        # À appeler sous verrou : attend une remise, dans l'ordre d'arrivée
+        waiter = _Waiter(self._lock)
+        self._waiters.append(waiter)
+        while waiter.conn is None and not waiter.create and not self._closed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            waiter.cond.wait(remaining)
+        if waiter.conn is not None or waiter.create:
+            return waiter.conn, waiter.create
+        self._waiters.remove(waiter)
+        if self._closed:
+            raise PoolError("Le pool de connexions est fermé")
+        self._timeouts += 1
+        raise PoolTimeout(
+            f"Aucune connexion disponible après {self.timeout:.1f} s "
+            f"({self._size}/{self.max_size} utilisées)"
+        )
+
+    def _grant(self):
+        # À appeler sous verrou : les places libérées reviennent aux appelants en attente
+        while self._waiters and self._size < self.max_size and not self._closed:
+            waiter = self._waiters.popleft()
+            self._size += 1
+            waiter.create = True
+            waiter.cond.notify()
+
+    def _expired(self, created, last_used, now, pending=0):
+        if now - created > self.max_lifetime:
+            return True
+        # On garde toujours `min_size` connexions chaudes
+        return now - last_used > self.max_idle and self._size - pending > self.min_size
+
+    def _healthy(self, conn, idle_for):
+        try:
+            return bool(self._check(conn, idle_for))
+        except Exception:
+            return False
+
+    def _drop(self, conn):
+        with self._lock:
+            self._forget(conn)
+        self._close_all([conn])
+
+    def _forget(self, conn):
+        # À appeler sous verrou
+        if self._created.pop(id(conn), None) is None:
+            return
+        self._size -= 1
+        self._discarded += 1
+        self._grant()
+
+    def _close_all(self, conns):
+        if not conns:
+            return
+        with self._lock:
+            for conn in conns:
+                self._forget(conn)
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
@@ -1,118 +1,341 @@
 
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import extensions
 from psycopg2.extras import DictCursor
 import hashlib
 from datetime import datetime
 from config import get_db_config
+from connection_pool import ConnectionPool
+
+# Au-delà de cette durée d'inactivité, une connexion empruntée au pool est
+# testée par un aller-retour avant d'être remise à l'appelant.
+PING_AFTER_IDLE = 30.0
+
+# Réglages SQLite par défaut (surchargeables via get_db_config)
+SQLITE_DEFAULTS = {
+    'sqlite_busy_timeout': 5000,            # ms
+    'sqlite_cache_size_kb': 20000,          # ~20 Mo de cache de pages par connexion
+    'sqlite_mmap_size': 256 * 1024 * 1024,  # lectures via mmap
+    'sqlite_checkpoint_interval': 60.0,     # s entre deux checkpoints WAL
+}
 
 def adapt_query(query, db_type):
     if db_type == 'sqlite':
         return query.replace("%s", "?")
     return query  # Pour PostgreSQL, on garde les %s
 
+def translate_ddl(query, db_type):
+    """Adapte une instruction DDL écrite pour PostgreSQL au dialecte cible."""
+    if db_type == 'sqlite':
+        return query.replace("SERIAL PRIMARY KEY", "INTEGER PRIMARY KEY AUTOINCREMENT")
+    return query
+
+def insert_returning_id(cursor, query, params, db_type):
+    """Exécute un INSERT et retourne l'identifiant de la ligne créée."""
+    if db_type == 'sqlite':
+        cursor.execute(adapt_query(query, db_type), params)
+        return cursor.lastrowid
+    cursor.execute(query.rstrip() + " RETURNING id", params)
+    return cursor.fetchone()[0]
+
+def _check_pg_connection(conn, idle_for):
+    """Vérifie qu'une connexion PostgreSQL du pool est encore utilisable."""
+    if conn.closed:
+        return False
+    if idle_for < PING_AFTER_IDLE:
+        return True
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")
+    conn.rollback()
+    return True
+
+class _RequestScope:
+    """Unité de travail d'un rerun : une seule connexion, validée une fois."""
+    __slots__ = ('conn',)
+
+    def __init__(self):
+        self.conn = None
+
 class DatabaseManager:
     def __init__(self):
         self.config = get_db_config()
-        self.conn = None
-        self.cursor = None
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # Chaque session Streamlit s'exécute dans son propre thread : la
+        # connexion, le curseur et l'unité de travail sont propres au thread.
+        self._local = threading.local()
+        # Moteur SQLite : une connexion par thread, checkpoints périodiques
+        self._sqlite_lock = threading.Lock()
+        self._sqlite_opened = 0
+        self._sqlite_checkpoints = 0
+        self._last_checkpoint = time.monotonic()
 
-    def connect(self):
+    @property
+    def conn(self):
+        """Connexion courante du thread appelant."""
+        return getattr(self._local, 'conn', None)
+
+    @conn.setter
+    def conn(self, value):
+        self._local.conn = value
+
+    @property
+    def cursor(self):
+        """Curseur courant du thread appelant."""
+        return getattr(self._local, 'cursor', None)
+
+    @cursor.setter
+    def cursor(self, value):
+        self._local.cursor = value
+
+    def _new_pg_connection(self):
+        return psycopg2.connect(
+            host=self.config['host'],
+            port=self.config['port'],
+            database=self.config['database'],
+            user=self.config['user'],
+            password=self.config['password']
+        )
+
+    def _get_pool(self):
+        """Crée le pool de connexions au premier usage."""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ConnectionPool(
+                        self._new_pg_connection,
+                        min_size=self.config.get('pool_min_size', 1),
+                        max_size=self.config.get('pool_max_size', 10),
+                        timeout=self.config.get('pool_timeout', 30.0),
+                        max_idle=self.config.get('pool_max_idle', 300.0),
+                        max_lifetime=self.config.get('pool_max_lifetime', 3600.0),
+                        check=_check_pg_connection
+                    )
+        return self._pool
+
+    def _sqlite_setting(self, key):
+        return self.config.get(key, SQLITE_DEFAULTS[key])
+
+    def _open_sqlite(self):
+        """Ouvre une connexion SQLite réglée pour la concurrence (WAL)."""
+        path = self.config['db_path']
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        busy_timeout = int(self._sqlite_setting('sqlite_busy_timeout'))
+        conn = sqlite3.connect(path, timeout=busy_timeout / 1000)
+        # WAL : les lecteurs ne bloquent plus l'écrivain (et inversement)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL suffit en WAL : pas de corruption possible, seule la
+        # dernière transaction peut être perdue en cas de coupure
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self._sqlite_setting('sqlite_cache_size_kb'))}")
+        conn.execute(f"PRAGMA mmap_size={int(self._sqlite_setting('sqlite_mmap_size'))}")
+        conn.execute(f"PRAGMA busy_timeout={busy_timeout}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA foreign_keys=ON")
+        with self._sqlite_lock:
+            self._sqlite_opened += 1
+        return conn
+
+    def _sqlite_connection(self):
+        """Retourne la connexion SQLite du thread courant (ouverte une fois)."""
+        conn = getattr(self._local, 'sqlite_conn', None)
+        if conn is None:
+            conn = self._open_sqlite()
+            self._local.sqlite_conn = conn
+        return conn
+
+    def _maybe_checkpoint(self, conn):
+        """Replie périodiquement le journal WAL dans la base."""
+        now = time.monotonic()
+        with self._sqlite_lock:
+            if now - self._last_checkpoint < self._sqlite_setting('sqlite_checkpoint_interval'):
+                return
+            self._last_checkpoint = now
+        try:
+            # PASSIVE : n'attend ni les lecteurs ni l'écrivain en cours
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            with self._sqlite_lock:
+                self._sqlite_checkpoints += 1
+        except sqlite3.Error as e:
+            print(f"Avertissement: checkpoint WAL impossible : {e}")
+
+    def _acquire(self):
+        """Obtient une connexion pour le thread courant selon le moteur."""
         if self.config['db_type'] == 'sqlite':
-            # Connexion SQLite supprimée pour PostgreSQL
-            self.cursor = self.conn.cursor()
-        else:  # PostgreSQL
-            self.conn = psycopg2.connect(
-                host=self.config['host'],
-                port=self.config['port'],
-                database=self.config['database'],
-                user=self.config['user'],
-                password=self.config['password']
-            )
-            self.cursor = self.conn.cursor(cursor_factory=DictCursor)
+            return self._sqlite_connection()
+        return self._get_pool().getconn()
+
+    def _new_cursor(self, conn):
+        if self.config['db_type'] == 'sqlite':
+            cursor = conn.cursor()
+            # Accès par index et par nom, comme DictCursor
+            cursor.row_factory = sqlite3.Row
+            return cursor
+        return conn.cursor(cursor_factory=DictCursor)
+
+    def _in_failed_transaction(self, conn):
+        if self.config['db_type'] == 'sqlite':
+            return False
+        return conn.get_transaction_status() == extensions.TRANSACTION_STATUS_INERROR
+
+    def _release(self, conn, commit=True):
+        """Termine la transaction en cours et rend la connexion au pool."""
+        if self.config['db_type'] == 'sqlite':
+            # La connexion reste ouverte et attachée au thread
+            try:
+                if commit:
+                    conn.commit()
+                else:
+                    conn.rollback()
+            except sqlite3.Error as e:
+                print(f"Erreur lors de la validation de la transaction : {e}")
+                conn.rollback()
+            self._maybe_checkpoint(conn)
+            return
+        broken = False
+        try:
+            if commit:
+                conn.commit()
+            else:
+                conn.rollback()
+        except Exception:
+            broken = True
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        if not broken and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            broken = True
+        self._get_pool().putconn(conn, discard=broken or bool(conn.closed))
+
+    @contextmanager
+    def connection(self):
+        """Emprunte une connexion au pool pour la durée du bloc `with`.
+
+        La transaction est validée en sortie normale et annulée si une
+        exception remonte ; la connexion est ensuite rendue au pool. Dans
+        une unité de travail (`request_scope`), la connexion de celle-ci est
+        réutilisée et validée en fin de rerun.
+        """
+        scope = self._current_scope()
+        if scope is not None:
+            yield self._scope_connection(scope)
+            return
+        conn = self._acquire()
+        try:
+            yield conn
+        except BaseException:
+            self._release(conn, commit=False)
+            raise
+        else:
+            self._release(conn)
+
+    def _current_scope(self):
+        return getattr(self._local, 'scope', None)
+
+    def _scope_connection(self, scope):
+        # Emprunt paresseux : une page sans accès aux données n'en coûte aucun
+        if scope.conn is None:
+            scope.conn = self._acquire()
+        return scope.conn
+
+    @contextmanager
+    def request_scope(self):
+        """Unité de travail couvrant un rerun Streamlit complet.
+
+        Tous les appels à connect()/close() et connection() effectués dans le
+        bloc partagent une même connexion, empruntée au premier accès et
+        validée une seule fois à la sortie (annulée si une exception remonte).
+        Les exceptions de contrôle de Streamlit (st.rerun, st.stop) dérivent
+        de BaseException et valident donc la transaction.
+        """
+        if self._current_scope() is not None:
+            yield
+            return
+        scope = _RequestScope()
+        self._local.scope = scope
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._local.scope = None
+            if scope.conn is not None:
+                if self.conn is scope.conn:
+                    self.conn = None
+                    self.cursor = None
+                    self._local.depth = 0
+                self._release(scope.conn, commit=not failed)
+
+    def release_scope(self):
+        """Valide l'unité de travail en cours et rend sa connexion au pool.
+
+        Un accès ultérieur dans le même rerun emprunte une nouvelle connexion ;
+        à appeler avant une attente pour ne pas garder une connexion inactive
+        (et une transaction ouverte) pendant ce temps.
+        """
+        scope = self._current_scope()
+        if scope is None or scope.conn is None or self.conn is scope.conn:
+            return
+        conn, scope.conn = scope.conn, None
+        self._release(conn)
+
+    def pool_stats(self):
+        """Retourne les compteurs du pool (taille, attentes, délais)."""
+        if self.config['db_type'] == 'sqlite':
+            with self._sqlite_lock:
+                return {
+                    'engine': 'sqlite',
+                    'connections_opened': self._sqlite_opened,
+                    'wal_checkpoints': self._sqlite_checkpoints,
+                }
+        if self._pool is None:
+            return {}
+        return self._pool.stats()
+
+    def connect(self):
+        if self.conn is not None:
+            # Appel imbriqué dans le même thread : on garde la connexion
+            self._local.depth = getattr(self._local, 'depth', 0) + 1
+            return
+        scope = self._current_scope()
+        if scope is not None:
+            self.conn = self._scope_connection(scope)
+        else:
+            self.conn = self._acquire()
+        self.cursor = self._new_cursor(self.conn)
 
     def close(self):
+        if getattr(self._local, 'depth', 0) > 0:
+            self._local.depth -= 1
+            return
         if self.conn:
-            self.conn.commit()
-            self.conn.close()
+            conn = self.conn
             self.conn = None
             self.cursor = None
+            scope = self._current_scope()
+            if scope is not None and scope.conn is conn:
+                # Validation différée en fin de rerun ; une requête en échec
+                # ne doit cependant pas bloquer les suivantes.
+                if self._in_failed_transaction(conn):
+                    conn.rollback()
+                return
+            self._release(conn)
 
     def init_db(self):
-        """Initialise la base de données avec les tables nécessaires."""
+        """Met le schéma à jour via les migrations et crée l'admin par défaut."""
+        from migrations import migrate
         self.connect()
         try:
-            # Table utilisateurs
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS utilisateurs (
-                id SERIAL PRIMARY KEY,
-                nom TEXT NOT NULL,
-                prenom TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                mot_de_passe TEXT NOT NULL,
-                role TEXT NOT NULL DEFAULT 'user',
-                date_naissance TEXT,
-                genre TEXT,
-                telephone TEXT,
-                date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            ''')
-
-            # Table entites
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS entites (
-                id SERIAL PRIMARY KEY,
-                nom TEXT NOT NULL UNIQUE
-            )
-            ''')
-
-            # Table filieres
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS filieres (
-                id SERIAL PRIMARY KEY,
-                nom TEXT NOT NULL,
-                entite_id INTEGER NOT NULL,
-                FOREIGN KEY (entite_id) REFERENCES entites (id),
-                UNIQUE(nom, entite_id)
-            )
-            ''')
-
-            # Table sessions
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sessions (
-                id SERIAL PRIMARY KEY,
-                annee_universitaire TEXT NOT NULL UNIQUE
-            )
-            ''')
-
-            # Table memoires
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS memoires (
-                id SERIAL PRIMARY KEY,
-                titre TEXT NOT NULL,
-                auteurs TEXT NOT NULL,
-                encadreur TEXT NOT NULL,
-                resume TEXT,
-                fichier_url TEXT NOT NULL,
-                tags TEXT,
-                filiere_id INTEGER NOT NULL,
-                session_id INTEGER NOT NULL,
-                version TEXT,
-                date_ajout TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (filiere_id) REFERENCES filieres (id),
-                FOREIGN KEY (session_id) REFERENCES sessions (id)
-            )
-            ''')
-
-            # Table logs
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS logs (
-                id SERIAL PRIMARY KEY,
-                action TEXT NOT NULL,
-                user_id INTEGER,
-                date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES utilisateurs (id)
-            )
-            ''')
+            # Aucune instruction DDL n'est émise si le schéma est à jour
+            migrate(self.conn, self.cursor, self.config['db_type'])
 
             # Vérifier si un admin existe déjà
             self.cursor.execute("SELECT COUNT(*) FROM utilisateurs WHERE role='admin'")
@@ -18,12 +18,13 @@ from apps import *
 import time
 import base64
 from theme import setup_theme, section_title, card, metric_card, info_card, action_button, data_table
+from database import db
 
 # Configuration du thème
 setup_theme()
 
 from apps import (
-    show_login_page, get_all_memoires, get_download_link, 
+    show_login_page, get_latest_memoires, get_download_link, 
     show_home_page as show_admin_home, show_search_page, 
     show_statistics_page, show_entities_management,
     show_filieres_management, show_sessions_management,
@@ -102,7 +103,7 @@ def show_welcome_page():
         </h2>
     """, unsafe_allow_html=True)
     
-    memoires = get_all_memoires().head(5)
+    memoires = get_latest_memoires(5)
     
     if len(memoires) == 0:
         st.markdown("""
@@ -175,7 +176,7 @@ def show_welcome_page():
                                 st.rerun()
                     else:
                         if st.button("📥 Télécharger", key=f"download_{memoire['id']}", use_container_width=True):
-                            get_download_link(memoire['fichier_pdf'], "Télécharger le PDF")
+                            get_download_link(memoire['fichier_url'], "Télécharger le PDF", memoire['titre'])
                 
                 st.info(memoire['resume'])
                 st.markdown(f"**🏷️ Mots-clés:** {memoire['tags']}")
@@ -516,4 +517,6 @@ def main():
         show_welcome_page()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # Une seule connexion et une seule validation par rerun
+    with db.request_scope():
+        main() 
\ No newline at end of file
@@ -0,0 +1,487 @@
+"""Migrations versionnées du schéma de la base de données.
+
+Chaque migration est appliquée une seule fois, dans sa propre transaction,
+et enregistrée dans la table `schema_version`. Les instructions sont écrites
+pour PostgreSQL et traduites pour SQLite par `translate_ddl` ; une migration
+peut aussi fournir des instructions propres à chaque moteur sous la forme
+d'un dictionnaire {'postgresql': [...], 'sqlite': [...]}.
+"""
+from database import adapt_query, translate_ddl
+
+# Clé du verrou consultatif PostgreSQL qui sérialise les migrations lorsque
+# plusieurs processus démarrent en même temps.
+MIGRATION_LOCK_ID = 424242
+
+MIGRATIONS = [
+    (1, "Schéma initial", [
+        '''
+        CREATE TABLE IF NOT EXISTS utilisateurs (
+            id SERIAL PRIMARY KEY,
+            nom TEXT NOT NULL,
+            prenom TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            mot_de_passe TEXT NOT NULL,
+            role TEXT NOT NULL DEFAULT 'user',
+            date_naissance TEXT,
+            genre TEXT,
+            telephone TEXT,
+            date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS entites (
+            id SERIAL PRIMARY KEY,
+            nom TEXT NOT NULL UNIQUE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS filieres (
+            id SERIAL PRIMARY KEY,
+            nom TEXT NOT NULL,
+            entite_id INTEGER NOT NULL,
+            FOREIGN KEY (entite_id) REFERENCES entites (id),
+            UNIQUE(nom, entite_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id SERIAL PRIMARY KEY,
+            annee_universitaire TEXT NOT NULL UNIQUE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS memoires (
+            id SERIAL PRIMARY KEY,
+            titre TEXT NOT NULL,
+            auteurs TEXT NOT NULL,
+            encadreur TEXT NOT NULL,
+            resume TEXT,
+            fichier_url TEXT NOT NULL,
+            tags TEXT,
+            filiere_id INTEGER NOT NULL,
+            session_id INTEGER NOT NULL,
+            version TEXT,
+            date_ajout TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (filiere_id) REFERENCES filieres (id),
+            FOREIGN KEY (session_id) REFERENCES sessions (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS logs (
+            id SERIAL PRIMARY KEY,
+            action TEXT NOT NULL,
+            user_id INTEGER,
+            date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES utilisateurs (id)
+        )
+        ''',
+    ]),
+    (2, "Index des clés étrangères et des tris", [
+        # Jointures de get_all_memoires et vérifications de delete_filiere / delete_session
+        "CREATE INDEX IF NOT EXISTS idx_memoires_filiere_id ON memoires (filiere_id)",
+        "CREATE INDEX IF NOT EXISTS idx_memoires_session_id ON memoires (session_id)",
+        # ORDER BY m.date_ajout DESC (parcours inverse de l'index)
+        "CREATE INDEX IF NOT EXISTS idx_memoires_date_ajout ON memoires (date_ajout, id)",
+        # Vérification de delete_entity et filtres par entité
+        "CREATE INDEX IF NOT EXISTS idx_filieres_entite_id ON filieres (entite_id)",
+        # Journal d'activité
+        "CREATE INDEX IF NOT EXISTS idx_logs_date ON logs (date)",
+        "CREATE INDEX IF NOT EXISTS idx_logs_user_id ON logs (user_id)",
+    ]),
+    (3, "Index plein texte des mémoires", {
+        # Vecteur pondéré (titre > mots-clés > résumé > auteurs/encadreur),
+        # recalculé par PostgreSQL à chaque INSERT/UPDATE
+        'postgresql': [
+            '''
+            ALTER TABLE memoires ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('french', coalesce(titre, '')), 'A') ||
+                setweight(to_tsvector('french', coalesce(tags, '')), 'B') ||
+                setweight(to_tsvector('french', coalesce(resume, '')), 'C') ||
+                setweight(to_tsvector('french', coalesce(auteurs, '') || ' ' || coalesce(encadreur, '')), 'D')
+            ) STORED
+            ''',
+            "CREATE INDEX IF NOT EXISTS idx_memoires_search ON memoires USING GIN (search_vector)",
+        ],
+        # Table FTS5 à contenu externe, synchronisée par triggers
+        'sqlite': [
+            '''
+            CREATE VIRTUAL TABLE IF NOT EXISTS memoires_fts USING fts5(
+                titre, tags, resume, auteurs, encadreur,
+                content='memoires', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS memoires_fts_ai AFTER INSERT ON memoires BEGIN
+                INSERT INTO memoires_fts (rowid, titre, tags, resume, auteurs, encadreur)
+                VALUES (new.id, new.titre, new.tags, new.resume, new.auteurs, new.encadreur);
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS memoires_fts_ad AFTER DELETE ON memoires BEGIN
+                INSERT INTO memoires_fts (memoires_fts, rowid, titre, tags, resume, auteurs, encadreur)
+                VALUES ('delete', old.id, old.titre, old.tags, old.resume, old.auteurs, old.encadreur);
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS memoires_fts_au
+            AFTER UPDATE OF titre, tags, resume, auteurs, encadreur ON memoires BEGIN
+                INSERT INTO memoires_fts (memoires_fts, rowid, titre, tags, resume, auteurs, encadreur)
+                VALUES ('delete', old.id, old.titre, old.tags, old.resume, old.auteurs, old.encadreur);
+                INSERT INTO memoires_fts (rowid, titre, tags, resume, auteurs, encadreur)
+                VALUES (new.id, new.titre, new.tags, new.resume, new.auteurs, new.encadreur);
+            END
+            ''',
+            # Indexation des mémoires déjà présents
+            "INSERT INTO memoires_fts (memoires_fts) VALUES ('rebuild')",
+        ],
+    }),
+    (4, "Compteurs de mémoires par filière et par session", {
+        # Un compteur par couple (filière, session), tenu à jour par trigger dans
+        # la transaction qui modifie `memoires` : les totaux par entité, filière
+        # et année s'en déduisent sans parcourir la table des mémoires.
+        'postgresql': [
+            '''
+            CREATE TABLE IF NOT EXISTS stats_memoires (
+                filiere_id INTEGER NOT NULL,
+                session_id INTEGER NOT NULL,
+                nb INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (filiere_id, session_id)
+            )
+            ''',
+            '''
+            CREATE OR REPLACE FUNCTION stats_memoires_maj() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    UPDATE stats_memoires SET nb = nb - 1
+                    WHERE filiere_id = OLD.filiere_id AND session_id = OLD.session_id;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO stats_memoires (filiere_id, session_id, nb)
+                    VALUES (NEW.filiere_id, NEW.session_id, 1)
+                    ON CONFLICT (filiere_id, session_id) DO UPDATE SET nb = stats_memoires.nb + 1;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+            ''',
+            "DROP TRIGGER IF EXISTS memoires_stats ON memoires",
+            '''
+            CREATE TRIGGER memoires_stats
+            AFTER INSERT OR DELETE OR UPDATE OF filiere_id, session_id ON memoires
+            FOR EACH ROW EXECUTE FUNCTION stats_memoires_maj()
+            ''',
+            # Comptage initial des mémoires déjà présents
+            '''
+            INSERT INTO stats_memoires (filiere_id, session_id, nb)
+            SELECT filiere_id, session_id, COUNT(*) FROM memoires GROUP BY filiere_id, session_id
+            ON CONFLICT (filiere_id, session_id) DO UPDATE SET nb = EXCLUDED.nb
+            ''',
+        ],
+        'sqlite': [
+            '''
+            CREATE TABLE IF NOT EXISTS stats_memoires (
+                filiere_id INTEGER NOT NULL,
+                session_id INTEGER NOT NULL,
+                nb INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (filiere_id, session_id)
+            ) WITHOUT ROWID
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS memoires_stats_ai AFTER INSERT ON memoires BEGIN
+                INSERT OR IGNORE INTO stats_memoires (filiere_id, session_id, nb)
+                VALUES (new.filiere_id, new.session_id, 0);
+                UPDATE stats_memoires SET nb = nb + 1
+                WHERE filiere_id = new.filiere_id AND session_id = new.session_id;
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS memoires_stats_ad AFTER DELETE ON memoires BEGIN
+                UPDATE stats_memoires SET nb = nb - 1
+                WHERE filiere_id = old.filiere_id AND session_id = old.session_id;
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS memoires_stats_au
+            AFTER UPDATE OF filiere_id, session_id ON memoires BEGIN
+                UPDATE stats_memoires SET nb = nb - 1
+                WHERE filiere_id = old.filiere_id AND session_id = old.session_id;
+                INSERT OR IGNORE INTO stats_memoires (filiere_id, session_id, nb)
+                VALUES (new.filiere_id, new.session_id, 0);
+                UPDATE stats_memoires SET nb = nb + 1
+                WHERE filiere_id = new.filiere_id AND session_id = new.session_id;
+            END
+            ''',
+            # Comptage initial des mémoires déjà présents
+            '''
+            INSERT OR REPLACE INTO stats_memoires (filiere_id, session_id, nb)
+            SELECT filiere_id, session_id, COUNT(*) FROM memoires GROUP BY filiere_id, session_id
+            ''',
+        ],
+    }),
+    (5, "Texte des PDF et suivi de son extraction", [
+        # Une ligne par page non vide ; la contrainte d'unicité sert aussi
+        # d'index pour relire ou remplacer le texte d'un mémoire
+        '''
+        CREATE TABLE IF NOT EXISTS pdf_content (
+            id SERIAL PRIMARY KEY,
+            memoire_id INTEGER NOT NULL,
+            page_num INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            FOREIGN KEY (memoire_id) REFERENCES memoires (id) ON DELETE CASCADE,
+            UNIQUE (memoire_id, page_num)
+        )
+        ''',
+        # État de l'extraction : en_attente, en_cours, termine ou erreur
+        '''
+        CREATE TABLE IF NOT EXISTS pdf_extraction (
+            memoire_id INTEGER PRIMARY KEY,
+            statut TEXT NOT NULL DEFAULT 'en_attente',
+            nb_pages INTEGER,
+            erreur TEXT,
+            date_maj TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (memoire_id) REFERENCES memoires (id) ON DELETE CASCADE
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_pdf_extraction_statut ON pdf_extraction (statut)",
+    ]),
+    (6, "Index plein texte des pages des PDF", {
+        'postgresql': [
+            '''
+            ALTER TABLE pdf_content ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (to_tsvector('french', content)) STORED
+            ''',
+            "CREATE INDEX IF NOT EXISTS idx_pdf_content_search ON pdf_content USING GIN (search_vector)",
+        ],
+        'sqlite': [
+            '''
+            CREATE VIRTUAL TABLE IF NOT EXISTS pdf_content_fts USING fts5(
+                content,
+                content='pdf_content', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS pdf_content_fts_ai AFTER INSERT ON pdf_content BEGIN
+                INSERT INTO pdf_content_fts (rowid, content) VALUES (new.id, new.content);
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS pdf_content_fts_ad AFTER DELETE ON pdf_content BEGIN
+                INSERT INTO pdf_content_fts (pdf_content_fts, rowid, content)
+                VALUES ('delete', old.id, old.content);
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS pdf_content_fts_au AFTER UPDATE OF content ON pdf_content BEGIN
+                INSERT INTO pdf_content_fts (pdf_content_fts, rowid, content)
+                VALUES ('delete', old.id, old.content);
+                INSERT INTO pdf_content_fts (rowid, content) VALUES (new.id, new.content);
+            END
+            ''',
+            "INSERT INTO pdf_content_fts (pdf_content_fts) VALUES ('rebuild')",
+        ],
+    }),
+    (7, "Suivi des imports en masse", [
+        # Un import par fichier de métadonnées (et dossier de PDFs) : `cle`
+        # est l'empreinte de leur contenu, ce qui permet de reprendre l'import
+        '''
+        CREATE TABLE IF NOT EXISTS import_jobs (
+            id SERIAL PRIMARY KEY,
+            cle TEXT NOT NULL UNIQUE,
+            type TEXT NOT NULL,
+            statut TEXT NOT NULL DEFAULT 'en_cours',
+            nb_lignes INTEGER,
+            date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            date_maj TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Une ligne par ligne du fichier : copie du PDF puis insertion du mémoire
+        '''
+        CREATE TABLE IF NOT EXISTS import_manifest (
+            job_id INTEGER NOT NULL,
+            cle_ligne TEXT NOT NULL,
+            sha256 TEXT,
+            fichier_url TEXT,
+            memoire_id INTEGER,
+            statut TEXT NOT NULL,
+            PRIMARY KEY (job_id, cle_ligne),
+            FOREIGN KEY (job_id) REFERENCES import_jobs (id) ON DELETE CASCADE
+        )
+        ''',
+    ]),
+    (8, "Avancement des imports en arrière-plan", [
+        # Compteurs mis à jour à chaque lot ; date_debut sert au calcul du
+        # débit et du temps restant de l'exécution en cours
+        "ALTER TABLE import_jobs ADD COLUMN nb_traites INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE import_jobs ADD COLUMN nb_importes INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE import_jobs ADD COLUMN nb_ignores INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE import_jobs ADD COLUMN nb_erreurs INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE import_jobs ADD COLUMN date_debut TIMESTAMP",
+        # Résumé final (JSON) ou message de l'erreur qui a interrompu l'import
+        "ALTER TABLE import_jobs ADD COLUMN resultat TEXT",
+        "ALTER TABLE import_jobs ADD COLUMN erreur TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_import_jobs_date ON import_jobs (date_creation)",
+    ]),
+    (9, "Compteurs de références des fichiers stockés", {
+        # Nombre de mémoires pointant vers chaque fichier, tenu à jour par
+        # trigger : un fichier partagé (stockage adressé par le contenu) n'est
+        # supprimé du disque que lorsque plus aucun mémoire n'y fait référence.
+        'postgresql': [
+            '''
+            CREATE TABLE IF NOT EXISTS fichiers (
+                fichier_url TEXT PRIMARY KEY,
+                nb_references INTEGER NOT NULL DEFAULT 0
+            )
+            ''',
+            '''
+            CREATE OR REPLACE FUNCTION fichiers_maj() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.fichier_url IS NOT NULL THEN
+                    UPDATE fichiers SET nb_references = nb_references - 1
+                    WHERE fichier_url = OLD.fichier_url;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.fichier_url IS NOT NULL THEN
+                    INSERT INTO fichiers (fichier_url, nb_references)
+                    VALUES (NEW.fichier_url, 1)
+                    ON CONFLICT (fichier_url) DO UPDATE SET nb_references = fichiers.nb_references + 1;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+            ''',
+            "DROP TRIGGER IF EXISTS memoires_fichiers ON memoires",
+            '''
+            CREATE TRIGGER memoires_fichiers
+            AFTER INSERT OR DELETE OR UPDATE OF fichier_url ON memoires
+            FOR EACH ROW EXECUTE FUNCTION fichiers_maj()
+            ''',
+            # Comptage initial des fichiers déjà référencés
+            '''
+            INSERT INTO fichiers (fichier_url, nb_references)
+            SELECT fichier_url, COUNT(*) FROM memoires
+            WHERE fichier_url IS NOT NULL GROUP BY fichier_url
+            ON CONFLICT (fichier_url) DO UPDATE SET nb_references = EXCLUDED.nb_references
+            ''',
+        ],
+        'sqlite': [
+            '''
+            CREATE TABLE IF NOT EXISTS fichiers (
+                fichier_url TEXT PRIMARY KEY,
+                nb_references INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS memoires_fichiers_ai
+            AFTER INSERT ON memoires WHEN new.fichier_url IS NOT NULL BEGIN
+                INSERT OR IGNORE INTO fichiers (fichier_url, nb_references)
+                VALUES (new.fichier_url, 0);
+                UPDATE fichiers SET nb_references = nb_references + 1
+                WHERE fichier_url = new.fichier_url;
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS memoires_fichiers_ad
+            AFTER DELETE ON memoires WHEN old.fichier_url IS NOT NULL BEGIN
+                UPDATE fichiers SET nb_references = nb_references - 1
+                WHERE fichier_url = old.fichier_url;
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS memoires_fichiers_au
+            AFTER UPDATE OF fichier_url ON memoires BEGIN
+                UPDATE fichiers SET nb_references = nb_references - 1
+                WHERE fichier_url = old.fichier_url;
+                INSERT OR IGNORE INTO fichiers (fichier_url, nb_references)
+                SELECT new.fichier_url, 0 WHERE new.fichier_url IS NOT NULL;
+                UPDATE fichiers SET nb_references = nb_references + 1
+                WHERE fichier_url = new.fichier_url;
+            END
+            ''',
+            # Comptage initial des fichiers déjà référencés
+            '''
+            INSERT OR REPLACE INTO fichiers (fichier_url, nb_references)
+            SELECT fichier_url, COUNT(*) FROM memoires
+            WHERE fichier_url IS NOT NULL GROUP BY fichier_url
+            ''',
+        ],
+    }),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _statements(steps, db_type):
+    if isinstance(steps, dict):
+        return steps.get(db_type, [])
+    return [translate_ddl(sql, db_type) for sql in steps]
+
+
+def _version_table_exists(cursor, db_type):
+    if db_type == 'sqlite':
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='schema_version'")
+        return cursor.fetchone() is not None
+    cursor.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+    return bool(cursor.fetchone()[0])
+
+
+def current_version(cursor, db_type):
+    """Retourne la version du schéma (0 si aucune migration n'a été appliquée)."""
+    if not _version_table_exists(cursor, db_type):
+        return 0
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    row = cursor.fetchone()
+    return row[0] or 0
+
+
+def _begin(conn, cursor, db_type):
+    """Ouvre la transaction d'une migration en prenant le verrou d'écriture."""
+    if db_type == 'sqlite':
+        if not conn.in_transaction:
+            cursor.execute("BEGIN IMMEDIATE")
+    else:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+
+
+def migrate(conn, cursor, db_type):
+    """Applique dans l'ordre les migrations manquantes.
+
+    Retourne la liste des versions appliquées ; elle est vide (et aucune
+    instruction DDL n'est émise) lorsque le schéma est déjà à jour.
+    """
+    version = current_version(cursor, db_type)
+    if version >= LATEST_VERSION:
+        conn.commit()
+        return []
+
+    applied = []
+    for number, description, steps in MIGRATIONS:
+        if number <= version:
+            continue
+        try:
+            _begin(conn, cursor, db_type)
+            cursor.execute(translate_ddl('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''', db_type))
+            # Un autre processus a pu appliquer la migration entre-temps
+            if current_version(cursor, db_type) >= number:
+                conn.commit()
+                continue
+            for sql in _statements(steps, db_type):
+                cursor.execute(sql)
+            cursor.execute(
+                adapt_query("INSERT INTO schema_version (version, description) VALUES (%s, %s)", db_type),
+                (number, description)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"✓ Migration {number} appliquée : {description}")
+        applied.append(number)
+    return applied
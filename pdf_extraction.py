@@ -0,0 +1,180 @@
+"""Extraction du texte des PDF, hors du fil des requêtes.
+
+Après un ajout ou un import, les mémoires sont marqués « en attente » dans
+la même transaction que leur insertion, puis confiés à un petit pool de
+threads qui lit chaque PDF, en extrait le texte page par page et l'écrit
+dans `pdf_content` par lots. L'état de chaque extraction est suivi dans
+`pdf_extraction`, si bien que l'interface n'attend jamais l'analyse.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from database import db, adapt_query
+from pdf_text import extract_cached
+
+EN_ATTENTE = 'en_attente'
+EN_COURS = 'en_cours'
+TERMINE = 'termine'
+ERREUR = 'erreur'
+
+# Nombre de pages insérées par appel à executemany
+PAGE_BATCH_SIZE = 200
+
+
+def set_status(cursor, db_type, memoire_ids, statut, nb_pages=None, erreur=None):
+    """Enregistre l'état d'extraction des mémoires donnés (sans valider)."""
+    cursor.executemany(adapt_query("""
+    INSERT INTO pdf_extraction (memoire_id, statut, nb_pages, erreur, date_maj)
+    VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+    ON CONFLICT (memoire_id) DO UPDATE SET
+        statut = excluded.statut, nb_pages = excluded.nb_pages,
+        erreur = excluded.erreur, date_maj = excluded.date_maj
+    """, db_type), [(int(memoire_id), statut, nb_pages, erreur) for memoire_id in memoire_ids])
+
+
+def write_pages(memoire_id, pages, batch_size=PAGE_BATCH_SIZE):
+    """Remplace le texte d'un mémoire par `pages` et le marque terminé.
+
+    Les pages sont insérées par lots dans une seule transaction ; retourne
+    le nombre de pages écrites.
+    """
+    db_type = db.config['db_type']
+    insert = adapt_query(
+        "INSERT INTO pdf_content (memoire_id, page_num, content) VALUES (%s, %s, %s)", db_type
+    )
+    count = 0
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(adapt_query("DELETE FROM pdf_content WHERE memoire_id = %s", db_type), (memoire_id,))
+        batch = []
+        for page_num, text in pages:
+            batch.append((memoire_id, page_num, text))
+            if len(batch) >= batch_size:
+                cursor.executemany(insert, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(insert, batch)
+            count += len(batch)
+        set_status(cursor, db_type, [memoire_id], TERMINE, nb_pages=count)
+    return count
+
+
+def get_status(memoire_ids):
+    """Retourne {memoire_id: statut} pour les mémoires donnés."""
+    memoire_ids = [int(memoire_id) for memoire_id in memoire_ids]
+    if not memoire_ids:
+        return {}
+    placeholders = ", ".join(["%s"] * len(memoire_ids))
+    db.connect()
+    try:
+        db.cursor.execute(adapt_query(
+            f"SELECT memoire_id, statut FROM pdf_extraction WHERE memoire_id IN ({placeholders})",
+            db.config['db_type']
+        ), memoire_ids)
+        return {row[0]: row[1] for row in db.cursor.fetchall()}
+    finally:
+        db.close()
+
+
+def status_counts():
+    """Retourne le nombre de mémoires par état d'extraction."""
+    db.connect()
+    try:
+        db.cursor.execute("SELECT statut, COUNT(*) FROM pdf_extraction GROUP BY statut")
+        return {row[0]: row[1] for row in db.cursor.fetchall()}
+    finally:
+        db.close()
+
+
+class ExtractionPipeline:
+    """Pool de threads qui extrait le texte des mémoires en attente."""
+
+    def __init__(self, read_file, max_workers=2):
+        self._read_file = read_file
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pdf-extraction")
+        self._lock = threading.Lock()
+        self._queued = set()
+        self.done = 0
+        self.failed = 0
+
+    def submit(self, memoires):
+        """Programme l'extraction de mémoires (id, fichier_url) déjà marqués en attente."""
+        scheduled = 0
+        for memoire_id, fichier_url in memoires:
+            memoire_id = int(memoire_id)
+            with self._lock:
+                if memoire_id in self._queued:
+                    continue
+                self._queued.add(memoire_id)
+            self._executor.submit(self._process, memoire_id, fichier_url)
+            scheduled += 1
+        return scheduled
+
+    def resume(self):
+        """Reprend les extractions interrompues (arrêt du serveur, plantage)."""
+        db.connect()
+        try:
+            db.cursor.execute(adapt_query("""
+            SELECT m.id, m.fichier_url
+            FROM pdf_extraction pe
+            JOIN memoires m ON m.id = pe.memoire_id
+            WHERE pe.statut IN (%s, %s)
+            """, db.config['db_type']), (EN_ATTENTE, EN_COURS))
+            memoires = [(row[0], row[1]) for row in db.cursor.fetchall()]
+        finally:
+            db.close()
+        return self.submit(memoires)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'queued': len(self._queued),
+                'done': self.done,
+                'failed': self.failed,
+            }
+
+    def _update_status(self, memoire_id, statut, erreur=None):
+        with db.connection() as conn:
+            set_status(conn.cursor(), db.config['db_type'], [memoire_id], statut, erreur=erreur)
+
+    def _process(self, memoire_id, fichier_url):
+        try:
+            self._update_status(memoire_id, EN_COURS)
+            data = self._read_file(fichier_url)
+            if data is None:
+                raise FileNotFoundError(f"Fichier introuvable : {fichier_url}")
+            pages, _ = extract_cached(data)
+            write_pages(memoire_id, pages)
+            with self._lock:
+                self.done += 1
+        except Exception as e:
+            print(f"Erreur lors de l'extraction du mémoire {memoire_id}: {e}")
+            with self._lock:
+                self.failed += 1
+            try:
+                self._update_status(memoire_id, ERREUR, erreur=str(e)[:500])
+            except Exception as status_error:
+                # Le mémoire a pu être supprimé entre-temps
+                print(f"Impossible d'enregistrer l'échec de l'extraction {memoire_id}: {status_error}")
+        finally:
+            with self._lock:
+                self._queued.discard(memoire_id)
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline(read_file):
+    """Retourne le pool d'extraction du processus, créé au premier appel.
+
+    À sa création, les extractions restées en attente sont reprises.
+    """
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = ExtractionPipeline(read_file)
+            _pipeline.resume()
+        return _pipeline
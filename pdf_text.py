@@ -0,0 +1,79 @@
+"""Extraction du texte des PDF et cache disque des résultats.
+
+Ce module n'accède pas à la base de données : ses fonctions peuvent être
+exécutées dans des processus de travail. Le texte extrait est conservé dans
+`data/cache/pdf_text`, indexé par l'empreinte SHA-256 du fichier, si bien
+qu'un fichier déjà traité n'est jamais analysé une seconde fois.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from io import BytesIO
+from PyPDF2 import PdfReader
+
+CACHE_DIR = os.path.join(os.getcwd(), "data", "cache", "pdf_text")
+
+
+def extract_pages(data):
+    """Itère sur les couples (numéro de page, texte) des pages non vides."""
+    reader = PdfReader(BytesIO(data))
+    for page_num, page in enumerate(reader.pages, start=1):
+        # PostgreSQL refuse le caractère NUL dans un champ texte
+        text = (page.extract_text() or '').replace('\x00', '').strip()
+        if text:
+            yield page_num, text
+
+
+def content_hash(data):
+    """Empreinte SHA-256 (hexadécimale) d'un contenu."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _cache_path(digest, cache_dir):
+    return os.path.join(cache_dir, digest[:2], f"{digest}.json.gz")
+
+
+def load_cached(digest, cache_dir=CACHE_DIR):
+    """Retourne les pages en cache pour cette empreinte, ou None."""
+    try:
+        with gzip.open(_cache_path(digest, cache_dir), 'rt', encoding='utf-8') as f:
+            return [(page_num, text) for page_num, text in json.load(f)]
+    except (OSError, ValueError):
+        # Absent ou illisible (écriture interrompue) : on réextrait
+        return None
+
+
+def store_cached(digest, pages, cache_dir=CACHE_DIR):
+    """Enregistre les pages extraites ; l'écriture est atomique."""
+    path = _cache_path(digest, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Fichier temporaire propre à chaque écriture : deux threads peuvent
+    # traiter le même contenu (fichier partagé par plusieurs mémoires)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as f:
+            json.dump(pages, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def extract_cached(data, cache_dir=CACHE_DIR):
+    """Retourne (pages, lu_en_cache) pour le contenu d'un PDF."""
+    digest = content_hash(data)
+    pages = load_cached(digest, cache_dir)
+    if pages is not None:
+        return pages, True
+    pages = list(extract_pages(data))
+    store_cached(digest, pages, cache_dir)
+    return pages, False
+
+
+def extract_file(path, cache_dir=CACHE_DIR):
+    """Extrait le texte d'un fichier PDF (exécutable dans un processus de travail)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return extract_cached(data, cache_dir)
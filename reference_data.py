@@ -0,0 +1,64 @@
+import pandas as pd
+from database import db, adapt_query
+from cache import app_cache
+
+
+class ReferenceData:
+    """Instantané des entités, filières et sessions.
+
+    Ces données ne changent que quelques fois par an : elles sont chargées
+    une fois, partagées par toutes les sessions et rechargées après chaque
+    ajout ou suppression. Les dictionnaires `*_names` sont ordonnés comme
+    les listes affichées et servent directement de `format_func`.
+    """
+
+    def __init__(self, entites, filieres, sessions):
+        self.entites = entites
+        self.filieres = filieres
+        self.sessions = sessions
+        self.entity_names = {int(i): nom for i, nom in zip(entites['id'], entites['nom'])}
+        self.filiere_names = {int(i): nom for i, nom in zip(filieres['id'], filieres['nom'])}
+        self.session_names = {
+            int(i): annee for i, annee in zip(sessions['id'], sessions['annee_universitaire'])
+        }
+        # Arbre entité -> filières (triées par nom)
+        self.filieres_by_entity = {
+            int(entite_id): group[['id', 'nom']].sort_values('nom').reset_index(drop=True)
+            for entite_id, group in filieres.groupby('entite_id')
+        }
+
+    def filieres_of(self, entite_id):
+        """Retourne les filières d'une entité (DataFrame id, nom)."""
+        group = self.filieres_by_entity.get(int(entite_id))
+        if group is None:
+            return pd.DataFrame(columns=['id', 'nom'])
+        return group
+
+
+def _load():
+    db_type = db.config['db_type']
+    db.connect()
+    try:
+        entites = pd.read_sql_query(adapt_query("SELECT * FROM entites ORDER BY nom", db_type), db.conn)
+        filieres = pd.read_sql_query(adapt_query("""
+        SELECT f.id, f.nom, e.nom as entite_nom, f.entite_id
+        FROM filieres f
+        JOIN entites e ON f.entite_id = e.id
+        ORDER BY e.nom, f.nom
+        """, db_type), db.conn)
+        sessions = pd.read_sql_query(
+            adapt_query("SELECT * FROM sessions ORDER BY annee_universitaire DESC", db_type), db.conn
+        )
+    finally:
+        db.close()
+    return ReferenceData(entites, filieres, sessions)
+
+
+def get_reference_data():
+    """Retourne l'instantané courant, chargé au premier appel."""
+    return app_cache.get_or_load('reference_data', _load, tags=('reference',))
+
+
+def invalidate_reference_data():
+    """À appeler après toute écriture sur entites, filieres ou sessions."""
+    app_cache.invalidate('reference')
@@ -0,0 +1,120 @@
+"""Réindexation du texte des PDF des mémoires existants.
+
+Usage (depuis le dossier de l'application) :
+
+    python reindex.py            # mémoires dont le texte n'est pas encore indexé
+    python reindex.py --all      # tous les mémoires
+    python reindex.py --workers 4
+
+L'analyse des PDF est répartie sur un pool de processus ; le texte extrait
+est écrit dans `pdf_content` au fil de l'eau, mémoire par mémoire, par lots
+de pages. Grâce au cache disque de `pdf_text`, relancer la commande après
+une interruption ne réanalyse que les fichiers qui n'ont pas été traités.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from database import db, adapt_query
+from pdf_extraction import set_status, write_pages, TERMINE, ERREUR
+from pdf_text import extract_file, CACHE_DIR
+from storage import FileStorage
+
+# Nombre de fichiers soumis par processus de travail avant d'attendre des résultats
+TASKS_PER_WORKER = 4
+
+
+def select_memoires(force=False):
+    """Retourne les mémoires (id, fichier_url) à réindexer."""
+    query = """
+    SELECT m.id, m.fichier_url
+    FROM memoires m
+    LEFT JOIN pdf_extraction pe ON pe.memoire_id = m.id
+    """
+    params = ()
+    if not force:
+        query += " WHERE pe.statut IS NULL OR pe.statut <> %s"
+        params = (TERMINE,)
+    query += " ORDER BY m.id"
+    db.connect()
+    try:
+        db.cursor.execute(adapt_query(query, db.config['db_type']), params)
+        return [(row[0], row[1]) for row in db.cursor.fetchall()]
+    finally:
+        db.close()
+
+
+def _record_error(memoire_id, message):
+    print(f"Erreur lors de l'extraction du mémoire {memoire_id}: {message}")
+    with db.connection() as conn:
+        set_status(conn.cursor(), db.config['db_type'], [memoire_id], ERREUR, erreur=message[:500])
+
+
+def reindex(force=False, workers=None, cache_dir=CACHE_DIR):
+    """Extrait et enregistre le texte des mémoires ; retourne les compteurs."""
+    storage = FileStorage()
+    memoires = select_memoires(force)
+    workers = workers or os.cpu_count() or 1
+    counts = {'memoires': len(memoires), 'indexes': 0, 'en_cache': 0, 'erreurs': 0, 'pages': 0}
+    if not memoires:
+        return counts
+
+    start = time.monotonic()
+    reported = 0
+    pending = {}
+    todo = iter(memoires)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            # Fenêtre bornée : les résultats sont écrits au fur et à mesure
+            # au lieu d'être tous gardés en mémoire
+            while len(pending) < workers * TASKS_PER_WORKER:
+                memoire = next(todo, None)
+                if memoire is None:
+                    break
+                memoire_id, fichier_url = memoire
+                path = storage.get_download_url(fichier_url)
+                if path is None:
+                    counts['erreurs'] += 1
+                    _record_error(memoire_id, f"Fichier introuvable : {fichier_url}")
+                    continue
+                pending[executor.submit(extract_file, path, cache_dir)] = memoire_id
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                memoire_id = pending.pop(future)
+                try:
+                    pages, from_cache = future.result()
+                    counts['pages'] += write_pages(memoire_id, pages)
+                except Exception as e:
+                    counts['erreurs'] += 1
+                    _record_error(memoire_id, str(e))
+                    continue
+                counts['indexes'] += 1
+                counts['en_cache'] += from_cache
+
+            processed = counts['indexes'] + counts['erreurs']
+            if processed - reported >= 50 or processed == len(memoires):
+                reported = processed
+                elapsed = time.monotonic() - start
+                print(f"{processed}/{len(memoires)} mémoires traités en {elapsed:.0f} s")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Réindexe le texte des PDF des mémoires.")
+    parser.add_argument('--all', action='store_true', help="réindexer aussi les mémoires déjà indexés")
+    parser.add_argument('--workers', type=int, default=None, help="nombre de processus (défaut : nombre de cœurs)")
+    args = parser.parse_args()
+
+    db.init_db()
+    counts = reindex(force=args.all, workers=args.workers)
+    print(
+        f"✓ {counts['indexes']}/{counts['memoires']} mémoires indexés "
+        f"({counts['en_cache']} depuis le cache, {counts['pages']} pages, {counts['erreurs']} erreurs)"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Répartition des fichiers stockés à plat dans des sous-dossiers.
+
+Usage (depuis le dossier de l'application) :
+
+    python shard_files.py             # déplace les fichiers de data/files
+    python shard_files.py --dry-run   # compte les fichiers à déplacer
+
+Les anciens fichiers (`data/files/<uuid>_<nom>.pdf`) sont déplacés un par un
+vers `data/files/ab/cd/<uuid>_<nom>.pdf`. Les URL `local://` enregistrées en
+base ne changent pas et `FileStorage` trouve chaque fichier à l'un ou l'autre
+emplacement : la commande peut être lancée pendant que l'application tourne,
+interrompue et relancée sans risque.
+"""
+import argparse
+import time
+from storage import FileStorage
+
+
+def shard_files(storage=None, dry_run=False):
+    """Déplace les fichiers stockés à plat ; retourne les compteurs."""
+    storage = storage or FileStorage()
+    counts = {'fichiers': 0, 'deplaces': 0, 'erreurs': 0}
+    start = time.monotonic()
+    for name in storage.legacy_files():
+        counts['fichiers'] += 1
+        if dry_run:
+            continue
+        try:
+            storage.shard_legacy_file(name)
+        except OSError as e:
+            # Fichier supprimé entre-temps ou droits insuffisants
+            counts['erreurs'] += 1
+            print(f"Erreur lors du déplacement du fichier {name}: {e}")
+            continue
+        counts['deplaces'] += 1
+        if counts['deplaces'] % 1000 == 0:
+            elapsed = time.monotonic() - start
+            print(f"{counts['deplaces']} fichiers déplacés en {elapsed:.0f} s")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Répartit les fichiers de data/files dans des sous-dossiers.")
+    parser.add_argument('--dry-run', action='store_true', help="compter les fichiers sans les déplacer")
+    args = parser.parse_args()
+
+    counts = shard_files(dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"{counts['fichiers']} fichiers stockés à plat à déplacer")
+    else:
+        print(f"✓ {counts['deplaces']}/{counts['fichiers']} fichiers déplacés ({counts['erreurs']} erreurs)")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,51 +2,168 @@ import os
 import io
 import uuid
 import shutil
+import hashlib
+import time
 from datetime import datetime
 from pathlib import Path
 
+from config import APP_CONFIG
+
+# Taille des blocs lus et écrits lors des copies de fichiers
+COPY_CHUNK_SIZE = 1024 * 1024
+# Sous-dossier des fichiers adressés par leur contenu (empreinte SHA-256)
+BLOB_DIR = "sha256"
+
+
+def shard_path(name):
+    """Chemin relatif réparti d'un fichier : deux niveaux de sous-dossiers.
+
+    Les sous-dossiers sont tirés de l'empreinte du nom ('ab/cd/nom'), ce qui
+    limite chaque dossier à quelques fichiers même pour des centaines de
+    milliers de mémoires.
+    """
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+    return os.path.join(digest[:2], digest[2:4], name)
+
+
 class FileStorage:
-    def __init__(self):
+    def __init__(self, content_addressed=None):
         # Créer le dossier de stockage des fichiers
         self.storage_dir = os.path.join(os.getcwd(), "data", "files")
-        os.makedirs(self.storage_dir, exist_ok=True)
+        self.tmp_dir = os.path.join(self.storage_dir, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        if content_addressed is None:
+            content_addressed = APP_CONFIG.get('storage_content_addressed', False)
+        self.content_addressed = content_addressed
         print("✓ Système de stockage local initialisé")
     
+    def _locations(self, name):
+        """Emplacements possibles d'un fichier, dans l'ordre où les chercher."""
+        if '/' in name:
+            # Fichier adressé par le contenu : son chemin est déjà réparti
+            return [os.path.join(self.storage_dir, name)]
+        sharded = os.path.join(self.storage_dir, shard_path(name))
+        # Ancienne disposition à plat ; le dernier essai couvre un fichier
+        # déplacé par shard_files.py pendant la recherche
+        return [sharded, os.path.join(self.storage_dir, name), sharded]
+    
+    def _path(self, file_path):
+        """Chemin sur disque correspondant à une URL 'local://'.
+
+        Les URL restent inchangées quelle que soit la disposition : un fichier
+        est cherché dans son sous-dossier puis à la racine de data/files.
+        Retourne l'emplacement réparti si le fichier n'existe nulle part.
+        """
+        if not file_path.startswith("local://"):
+            raise ValueError("Le chemin du fichier doit commencer par 'local://'")
+        locations = self._locations(file_path.replace("local://", ""))
+        for location in locations:
+            if os.path.exists(location):
+                return location
+        return locations[0]
+    
+    def legacy_files(self):
+        """Itère sur les noms des fichiers encore stockés à plat."""
+        with os.scandir(self.storage_dir) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    yield entry.name
+    
+    def shard_legacy_file(self, name):
+        """Déplace un fichier stocké à plat dans son sous-dossier.
+
+        Le renommage est atomique : à tout instant le fichier se trouve à
+        l'un des deux emplacements examinés par _path.
+        """
+        target = os.path.join(self.storage_dir, shard_path(name))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(os.path.join(self.storage_dir, name), target)
+        return target
+    
+    @staticmethod
+    def _write(stream, path, chunk_size):
+        """Écrit le flux par blocs dans path ; retourne l'empreinte SHA-256."""
+        digest = hashlib.sha256()
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        with open(path, 'wb') as target:
+            while True:
+                size = stream.readinto(buffer)
+                if not size:
+                    break
+                digest.update(view[:size])
+                target.write(view[:size])
+        return digest.hexdigest()
+    
+    def _store_blob(self, tmp_path, digest, filename):
+        """Range un fichier temporaire sous son empreinte et retourne son URL.
+
+        Si le contenu est déjà stocké, le fichier temporaire est supprimé et
+        le fichier existant est réutilisé : sa date de modification est mise
+        à jour pour qu'une suppression concurrente (voir delete_file) ne
+        l'efface pas avant que le nouveau mémoire n'y fasse référence.
+        """
+        extension = os.path.splitext(filename)[1].lower()
+        name = f"{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+        blob_path = os.path.join(self.storage_dir, name)
+        if os.path.exists(blob_path):
+            try:
+                os.utime(blob_path)
+                os.remove(tmp_path)
+                return f"local://{name}"
+            except FileNotFoundError:
+                # Supprimé entre-temps : on range la nouvelle copie
+                pass
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(tmp_path, blob_path)
+        return f"local://{name}"
+    
     def save_file(self, file_obj, filename):
         """Sauvegarde un fichier dans le stockage local."""
-        try:
-            # Générer un nom unique pour le fichier
+        # Si c'est un objet fichier (comme UploadedFile de Streamlit), on le
+        # lit par blocs ; si ce sont déjà des bytes, on les enveloppe
+        stream = file_obj if hasattr(file_obj, 'readinto') else io.BytesIO(file_obj)
+        success, path, _ = self.save_stream(stream, filename)
+        return success, path
+    
+    def save_stream(self, stream, filename, chunk_size=COPY_CHUNK_SIZE):
+        """Enregistre le contenu d'un flux binaire par blocs.
+
+        Le contenu n'est jamais chargé entièrement en mémoire et son empreinte
+        SHA-256 est calculée pendant l'écriture. En mode adressé par le
+        contenu, un fichier identique déjà stocké est réutilisé au lieu d'être
+        dupliqué. Retourne (succès, chemin, empreinte hexadécimale).
+        """
+        if self.content_addressed:
+            file_path = os.path.join(self.tmp_dir, f"{uuid.uuid4()}.tmp")
+        else:
             unique_filename = f"{uuid.uuid4()}_{filename}"
-            file_path = os.path.join(self.storage_dir, unique_filename)
-            
-            # Sauvegarder le fichier
-            if hasattr(file_obj, 'read'):
-                # Si c'est un objet fichier (comme UploadedFile de Streamlit)
-                content = file_obj.read()
-            else:
-                # Si c'est déjà des bytes
-                content = file_obj
-            
-            # Écrire le fichier
-            with open(file_path, 'wb') as f:
-                f.write(content)
-            
-            # Retourner le chemin relatif
-            return True, f"local://{unique_filename}"
-            
+            file_path = os.path.join(self.storage_dir, shard_path(unique_filename))
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            digest = self._write(stream, file_path, chunk_size)
+            if self.content_addressed:
+                return True, self._store_blob(file_path, digest, filename), digest
+            return True, f"local://{unique_filename}", digest
         except Exception as e:
-            print(f"Erreur lors de la sauvegarde du fichier: {str(e)}")
-            return False, None
+            print(f"Erreur lors de l'enregistrement du fichier {filename}: {str(e)}")
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            return False, None, None
+    
+    def copy_file(self, source_path, filename, chunk_size=COPY_CHUNK_SIZE):
+        """Copie un fichier dans le stockage local par blocs (voir save_stream)."""
+        try:
+            with open(source_path, 'rb') as source:
+                return self.save_stream(source, filename, chunk_size)
+        except OSError as e:
+            print(f"Erreur lors de la copie du fichier {source_path}: {str(e)}")
+            return False, None, None
     
     def get_file(self, file_path):
         """Récupère un fichier depuis le stockage local."""
         try:
-            if not file_path.startswith("local://"):
-                raise ValueError("Le chemin du fichier doit commencer par 'local://'")
-            
-            # Extraire le nom du fichier
-            filename = file_path.replace("local://", "")
-            full_path = os.path.join(self.storage_dir, filename)
+            full_path = self._path(file_path)
             
             # Vérifier si le fichier existe
             if not os.path.exists(full_path):
@@ -54,24 +171,36 @@ class FileStorage:
                 return None
             
             # Lire et retourner le contenu du fichier
-            with open(full_path, 'rb') as f:
-                return f.read()
+            try:
+                with open(full_path, 'rb') as f:
+                    return f.read()
+            except FileNotFoundError:
+                # Déplacé dans son sous-dossier entre-temps (shard_files.py)
+                with open(self._path(file_path), 'rb') as f:
+                    return f.read()
                 
         except Exception as e:
             print(f"Erreur lors de la récupération du fichier {file_path}: {str(e)}")
             return None
     
-    def delete_file(self, file_path):
-        """Supprime un fichier du stockage local."""
+    def delete_file(self, file_path, min_age=0):
+        """Supprime un fichier du stockage local.
+
+        Un fichier modifié depuis moins de min_age secondes est conservé : en
+        mode adressé par le contenu, il vient peut-être d'être réutilisé par
+        un enregistrement en cours.
+        """
         try:
-            if not file_path.startswith("local://"):
-                raise ValueError("Le chemin du fichier doit commencer par 'local://'")
-                
-            filename = file_path.replace("local://", "")
-            full_path = os.path.join(self.storage_dir, filename)
+            full_path = self._path(file_path)
             
             if os.path.exists(full_path):
-                os.remove(full_path)
+                if min_age and time.time() - os.path.getmtime(full_path) < min_age:
+                    return False
+                try:
+                    os.remove(full_path)
+                except FileNotFoundError:
+                    # Déplacé dans son sous-dossier entre-temps (shard_files.py)
+                    os.remove(self._path(file_path))
                 return True
             return False
         except Exception as e:
@@ -81,11 +210,7 @@ class FileStorage:
     def get_download_url(self, file_path, expires=3600):
         """Retourne le chemin local du fichier pour le téléchargement."""
         try:
-            if not file_path.startswith("local://"):
-                raise ValueError("Le chemin du fichier doit commencer par 'local://'")
-                
-            filename = file_path.replace("local://", "")
-            full_path = os.path.join(self.storage_dir, filename)
+            full_path = self._path(file_path)
             
             if os.path.exists(full_path):
                 return full_path
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def app_db(tmp_path_factory):
+    """Base SQLite jetable, et dossier de travail temporaire pour data/files."""
+    workdir = tmp_path_factory.mktemp('app')
+    previous = os.getcwd()
+    os.chdir(workdir)
+    # get_db_config lit st.secrets : configuration SQLite minimale
+    (workdir / '.streamlit').mkdir()
+    (workdir / '.streamlit' / 'secrets.toml').write_text('db_type = "sqlite"\n')
+    from database import db
+    db.config = dict(db.config, db_type='sqlite', db_path=str(workdir / 'memoires_db.sqlite'))
+    db.init_db()
+    db.connect()
+    try:
+        db.cursor.execute("INSERT INTO entites (nom) VALUES ('FAST')")
+        db.cursor.execute("INSERT INTO filieres (nom, entite_id) VALUES ('Informatique', 1)")
+        db.cursor.execute("INSERT INTO sessions (annee_universitaire) VALUES ('2022-2023')")
+        db.conn.commit()
+    finally:
+        db.close()
+    yield db
+    os.chdir(previous)
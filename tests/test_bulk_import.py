@@ -0,0 +1,104 @@
+import io
+
+import pandas as pd
+import pytest
+
+
+def _upload(df, name):
+    buffer = io.BytesIO()
+    if name.endswith('.csv'):
+        buffer.write(df.to_csv(index=False).encode())
+    else:
+        df.to_excel(buffer, index=False)
+    buffer.name = name
+    return buffer
+
+
+@pytest.fixture
+def lot(app_db, tmp_path):
+    folder = tmp_path / 'pdfs'
+    folder.mkdir()
+    rows = []
+    for i in range(9):
+        (folder / f"lot{i}.pdf").write_bytes(f"%PDF-1.4 lot {tmp_path.name} {i}".encode())
+        rows.append(dict(
+            titre=f"Mémoire {tmp_path.name} {i}", auteurs="Auteur", encadreur="Encadreur", resume="Résumé",
+            tags="", filiere_nom="Informatique", annee_universitaire="2022-2023", version="",
+            nom_fichier=f"lot{i}.pdf",
+        ))
+    return pd.DataFrame(rows), str(folder)
+
+
+def _count(db, prefix):
+    db.connect()
+    try:
+        db.cursor.execute("SELECT COUNT(*) FROM memoires WHERE titre LIKE ?", (f"{prefix}%",))
+        return db.cursor.fetchone()[0]
+    finally:
+        db.close()
+
+
+def test_same_rows_in_another_format_are_not_imported_twice(app_db, lot, tmp_path):
+    from bulk_import import bulk_import_memoires
+
+    df, folder = lot
+    ok, result = bulk_import_memoires(_upload(df, 'lot.xlsx'), folder)
+    assert ok and result['success_count'] == 9
+
+    ok, result = bulk_import_memoires(_upload(df, 'lot.csv'), folder)
+    assert ok and result['success_count'] == 0 and result['skipped_count'] == 9
+    assert _count(app_db, f"Mémoire {tmp_path.name}") == 9
+
+
+def test_corrected_cell_does_not_duplicate_the_memoire(app_db, lot, tmp_path):
+    from bulk_import import bulk_import_memoires
+
+    df, folder = lot
+    bulk_import_memoires(_upload(df, 'lot.csv'), folder)
+    corrected = df.copy()
+    corrected.loc[0, 'resume'] = "Résumé corrigé"
+    ok, result = bulk_import_memoires(_upload(corrected, 'lot.csv'), folder)
+    assert ok and result['success_count'] == 0 and result['skipped_count'] == 9
+    assert _count(app_db, f"Mémoire {tmp_path.name}") == 9
+
+
+def test_failed_structure_import_rolls_back_every_batch(app_db):
+    from bulk_import import import_structure
+
+    entites = pd.DataFrame({'nom': ['Entité annulée']})
+    # Colonne entite_nom absente : échec après l'insertion des entités
+    filieres = pd.DataFrame({'nom': ['Filière annulée']})
+    sessions = pd.DataFrame({'annee_universitaire': ['1999-2000']})
+    app_db.connect()
+    try:
+        with pytest.raises(KeyError):
+            import_structure(app_db.cursor, entites, filieres, sessions)
+        app_db.conn.rollback()
+        app_db.cursor.execute("SELECT COUNT(*) FROM entites WHERE nom = 'Entité annulée'")
+        assert app_db.cursor.fetchone()[0] == 0
+    finally:
+        app_db.close()
+
+
+def test_archive_is_read_from_a_copy_of_the_upload(app_db, lot, tmp_path):
+    import os
+    import zipfile
+
+    from bulk_import import bulk_import_memoires, open_archive
+
+    df, folder = lot
+    upload = io.BytesIO()
+    with zipfile.ZipFile(upload, 'w') as archive:
+        archive.writestr('lot/lot.csv', df.to_csv(index=False))
+        for name in df['nom_fichier']:
+            archive.write(os.path.join(folder, name), f"lot/{name}")
+    metadata_file, pdf_source = open_archive(upload)
+    # Le fichier téléversé disparaît à la fin du rerun qui l'a reçu
+    upload.close()
+
+    try:
+        ok, result = bulk_import_memoires(metadata_file, pdf_source)
+    finally:
+        pdf_source.close()
+    assert ok and result['success_count'] == 9
+    assert _count(app_db, f"Mémoire {tmp_path.name}") == 9
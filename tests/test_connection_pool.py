@@ -0,0 +1,173 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connection_pool import ConnectionPool, PoolError, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    opened = []
+
+    def factory():
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    kwargs.setdefault('check', lambda conn, idle_for: not conn.broken)
+    return ConnectionPool(factory, **kwargs), opened
+
+
+def test_reuses_returned_connection():
+    pool, opened = make_pool(max_size=2)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+    assert len(opened) == 1
+
+
+def test_timeout_when_exhausted():
+    pool, _ = make_pool(max_size=1, timeout=0.05)
+    pool.getconn()
+    start = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert time.monotonic() - start >= 0.05
+    assert pool.stats()['timeouts'] == 1
+    assert pool.stats()['waiting'] == 0
+
+
+def test_expired_connection_is_replaced():
+    pool, opened = make_pool(max_size=2, max_lifetime=0.01)
+    conn = pool.getconn()
+    time.sleep(0.02)
+    pool.putconn(conn)
+    assert conn.closed
+    assert pool.getconn() is not conn
+    assert pool.stats()['size'] == 1
+
+
+def test_idle_connection_beyond_min_size_is_closed():
+    pool, _ = make_pool(min_size=0, max_size=2, max_idle=0.01)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    time.sleep(0.02)
+    assert pool.getconn() is not conn
+    assert conn.closed
+
+
+def test_broken_connection_is_discarded():
+    pool, opened = make_pool(max_size=1)
+    conn = pool.getconn()
+    conn.broken = True
+    pool.putconn(conn)
+    fresh = pool.getconn()
+    assert fresh is not conn and conn.closed
+    stats = pool.stats()
+    assert stats['failed_checks'] == 1 and stats['size'] == 1
+
+
+def test_discard_wakes_waiter():
+    pool, _ = make_pool(max_size=1, timeout=2)
+    conn = pool.getconn()
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(pool.getconn()))
+    waiter.start()
+    time.sleep(0.05)
+    pool.putconn(conn, discard=True)
+    waiter.join(1)
+    assert result and result[0] is not conn
+
+
+def test_waiters_are_served_in_arrival_order():
+    pool, _ = make_pool(max_size=1, timeout=2)
+    conn = pool.getconn()
+    order = []
+
+    def borrow(name):
+        c = pool.getconn()
+        order.append(name)
+        pool.putconn(c)
+
+    threads = []
+    for name in range(3):
+        thread = threading.Thread(target=borrow, args=(name,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.02)
+    pool.putconn(conn)
+    for thread in threads:
+        thread.join(1)
+    assert order == [0, 1, 2]
+
+
+def test_contention_without_timeouts():
+    pool, opened = make_pool(max_size=4, timeout=0.5)
+    errors = []
+
+    def worker():
+        for _ in range(50):
+            try:
+                conn = pool.getconn()
+            except PoolTimeout as e:
+                errors.append(e)
+                continue
+            time.sleep(0.001)
+            pool.putconn(conn)
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    stats = pool.stats()
+    assert stats['checkouts'] == 16 * 50
+    assert stats['size'] <= 4 and len(opened) == 4
+
+
+def test_factory_failure_frees_the_slot():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("connexion refusée")
+        return FakeConnection()
+
+    pool = ConnectionPool(factory, max_size=1, timeout=0.1)
+    with pytest.raises(OSError):
+        pool.getconn()
+    assert pool.getconn() is not None
+
+
+def test_closeall_wakes_waiters():
+    pool, _ = make_pool(max_size=1, timeout=2)
+    pool.getconn()
+    errors = []
+
+    def borrow():
+        try:
+            pool.getconn()
+        except PoolError as e:
+            errors.append(e)
+
+    waiter = threading.Thread(target=borrow)
+    waiter.start()
+    time.sleep(0.05)
+    pool.closeall()
+    waiter.join(1)
+    assert len(errors) == 1 and not isinstance(errors[0], PoolTimeout)
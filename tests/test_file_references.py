@@ -0,0 +1,80 @@
+import os
+import time
+
+
+def _age(path, seconds):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def _execute(db, sql, params=()):
+    db.connect()
+    try:
+        db.cursor.execute(sql, params)
+        db.conn.commit()
+    finally:
+        db.close()
+
+
+def _add_memoire(db, fichier_url):
+    _execute(db, """
+    INSERT INTO memoires (titre, auteurs, encadreur, resume, fichier_url, filiere_id, session_id)
+    VALUES ('Titre', 'A', 'E', 'R', ?, 1, 1)
+    """, (fichier_url,))
+
+
+def test_shared_file_is_removed_with_its_last_reference(app_db):
+    import apps
+
+    ok, url = apps.storage.save_file(b"%PDF-partage", "a.pdf")
+    _, same = apps.storage.save_file(b"%PDF-partage", "b.pdf")
+    assert ok and same == url
+    _add_memoire(app_db, url)
+    _add_memoire(app_db, url)
+    path = apps.storage.get_download_url(url)
+    _age(path, 3600)
+
+    _execute(app_db, "DELETE FROM memoires WHERE id = (SELECT MIN(id) FROM memoires WHERE fichier_url = ?)", (url,))
+    apps.purge_released_files()
+    assert os.path.exists(path)
+
+    _execute(app_db, "DELETE FROM memoires WHERE fichier_url = ?", (url,))
+    apps.purge_released_files()
+    assert not os.path.exists(path)
+
+
+def test_recent_file_stays_registered_until_purged(app_db):
+    import apps
+
+    _, url = apps.storage.save_file(b"%PDF-recent", "r.pdf")
+    _add_memoire(app_db, url)
+    _execute(app_db, "DELETE FROM memoires WHERE fichier_url = ?", (url,))
+    apps.purge_released_files()
+    path = apps.storage.get_download_url(url)
+    assert path is not None
+
+    _age(path, 3600)
+    apps.purge_released_files()
+    assert apps.storage.get_download_url(url) is None
+
+
+def test_file_copied_by_running_import_is_kept(app_db):
+    import apps
+    from bulk_import import new_job, LIGNE_COPIEE
+
+    _, url = apps.storage.save_file(b"%PDF-import", "i.pdf")
+    _add_memoire(app_db, url)
+    _execute(app_db, "DELETE FROM memoires WHERE fichier_url = ?", (url,))
+    job_id = new_job("cle-test-purge", "memoires")
+    _execute(app_db, """
+    INSERT INTO import_manifest (job_id, cle_ligne, sha256, fichier_url, statut) VALUES (?, 'ligne', '', ?, ?)
+    """, (job_id, url, LIGNE_COPIEE))
+    path = apps.storage.get_download_url(url)
+    _age(path, 3600)
+
+    apps.purge_released_files()
+    assert os.path.exists(path)
+
+    _execute(app_db, "DELETE FROM import_manifest WHERE job_id = ?", (job_id,))
+    apps.purge_released_files()
+    assert not os.path.exists(path)
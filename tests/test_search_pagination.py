@@ -0,0 +1,37 @@
+import pytest
+
+
+@pytest.fixture(scope='module')
+def tied_memoires(app_db):
+    # Même texte et même date : les scores et les dates sont tous à égalité
+    app_db.connect()
+    try:
+        app_db.cursor.executemany(
+            """
+            INSERT INTO memoires (titre, auteurs, encadreur, resume, fichier_url, tags,
+                                  filiere_id, session_id, date_ajout)
+            VALUES ('Réseaux de capteurs', 'A', 'E', 'Étude des réseaux', ?, 'réseaux', 1, 1,
+                    '2024-01-01 00:00:00')
+            """,
+            [(f"local://egalite-{i}.pdf",) for i in range(23)]
+        )
+        app_db.conn.commit()
+        app_db.cursor.execute("SELECT id FROM memoires WHERE fichier_url LIKE 'local://egalite-%'")
+        return {row[0] for row in app_db.cursor.fetchall()}
+    finally:
+        app_db.close()
+
+
+def test_keyset_pages_cover_tied_scores_once(tied_memoires):
+    import apps
+
+    seen = []
+    page = apps.search_memoires_page("réseaux", page_size=5)
+    assert page['total'] == len(tied_memoires)
+    while True:
+        seen += page['results']['id'].tolist()
+        if page['next_cursor'] is None:
+            break
+        page = apps.search_memoires_page("réseaux", page_size=5, after=page['next_cursor'], with_total=False)
+    assert len(seen) == len(set(seen))
+    assert set(seen) == tied_memoires